@@ -0,0 +1,76 @@
+"""
+Benchmark: vectorized history analytics
+Author: Mindy Stricklin
+
+Builds a synthetic columnar history (many cities over several years)
+of each requested size and times HistoryAnalytics loading it and each
+analytics query. Requires numpy.
+
+    python -m benchmarks.bench_analytics --rows 1000000 10000000
+"""
+
+import time
+import random
+import argparse
+import tempfile
+from datetime import date, timedelta
+
+from features.weather_history import WeatherHistory
+from features.history_analytics import HistoryAnalytics
+
+CONDITIONS = ['Clear', 'Clouds', 'Rain', 'Snow', 'Mist', 'Thunderstorm']
+
+def fill_history(history, row_count, city_count, years, batch_size=100000):
+    """Append row_count synthetic observations to a columnar history"""
+    rng = random.Random(42)
+    start = date(2015, 1, 1)
+    day_count = years * 365
+    dates = [(start + timedelta(days=day)).isoformat() for day in range(day_count)]
+    cities = [(f"City{number}", 'US') for number in range(city_count)]
+    
+    batch = []
+    for i in range(row_count):
+        day = i * day_count // row_count
+        city, state = cities[i % city_count]
+        seasonal = 20 * ((day % 365) / 182.5 - 1) ** 2
+        batch.append((dates[day], city, state, round(rng.gauss(40 + seasonal, 8), 1),
+                      CONDITIONS[rng.randrange(len(CONDITIONS))], round(rng.gauss(1013, 6), 1)))
+        if len(batch) == batch_size:
+            history.store.append_many(batch)
+            batch = []
+    history.store.append_many(batch)
+
+def timed(fn, *args):
+    """Run fn once and return (result, seconds)"""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000000],
+                        help="history sizes to test, in rows")
+    parser.add_argument('--cities', type=int, default=500)
+    parser.add_argument('--years', type=int, default=10)
+    args = parser.parse_args(argv)
+    
+    for row_count in args.rows:
+        with tempfile.TemporaryDirectory() as folder:
+            history = WeatherHistory(folder, backend='columnar')
+            _, build = timed(fill_history, history, row_count, args.cities, args.years)
+            
+            analytics, load = timed(HistoryAnalytics, history)
+            timings = [('load', load)]
+            for name, query in (('daily', analytics.daily_stats),
+                                ('rolling', analytics.rolling_means),
+                                ('percentiles', analytics.temperature_percentiles),
+                                ('pressure', analytics.pressure_trends),
+                                ('conditions', analytics.condition_frequencies)):
+                timings.append((name, timed(query)[1]))
+            
+            print(f"{row_count:>11,} rows, {args.cities} cities, {args.years} years "
+                  f"(built in {build:.1f}s)")
+            print('  ' + ', '.join(f"{name} {seconds:.2f}s" for name, seconds in timings))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark: WeatherHistory.get_recent_history tail reader
+Author: Mindy Stricklin
+
+Writes a synthetic text history of each requested size and times
+get_recent_history(N), which reads blocks backwards from the end of
+the file, against the old readlines()[-N:] approach. The tail reader's
+time should stay flat as the file grows.
+
+    python -m benchmarks.bench_recent_history --lines 100000 1000000 10000000
+"""
+
+import os
+import time
+import argparse
+import tempfile
+
+from features.weather_history import WeatherHistory
+
+CITIES = [('Austin', 'TX'), ('Denver', 'CO'), ('Boston', 'MA'), ('Seattle', 'WA'), ('Miami', 'FL')]
+CONDITIONS = ['Clear', 'Clouds', 'Rain', 'Snow']
+
+def write_history(file_path, line_count):
+    """Write line_count history lines, buffered"""
+    with open(file_path, 'w') as f:
+        batch = []
+        for i in range(line_count):
+            city, state = CITIES[i % len(CITIES)]
+            day = i // 1000
+            batch.append(f"{2000 + day // 336:04d}-{day // 28 % 12 + 1:02d}-{day % 28 + 1:02d},"
+                         f"{city},{state},{40 + i % 60},{CONDITIONS[i % len(CONDITIONS)]},1013.2\n")
+            if len(batch) == 100000:
+                f.writelines(batch)
+                batch = []
+        f.writelines(batch)
+
+def readlines_tail(file_path, count):
+    """The old approach: read every line, keep the last count"""
+    with open(file_path, 'r') as f:
+        return f.readlines()[-count:]
+
+def best_of(repeats, fn, *args):
+    """Best wall time of repeats calls, in ms"""
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(*args)
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--lines', type=int, nargs='+', default=[100000, 1000000],
+                        help="history sizes to test, in lines")
+    parser.add_argument('--recent', type=int, default=30, help="records to read from the end")
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args(argv)
+    
+    print(f"get_recent_history({args.recent}) vs readlines()[-{args.recent}:]")
+    for line_count in args.lines:
+        with tempfile.TemporaryDirectory() as folder:
+            history = WeatherHistory(folder)
+            write_history(history.history_file, line_count)
+            size_mb = os.path.getsize(history.history_file) / (1024 * 1024)
+            
+            assert len(history.get_recent_history(args.recent)) == min(args.recent, line_count)
+            tail = best_of(args.repeats, history.get_recent_history, args.recent)
+            full = best_of(min(args.repeats, 2), readlines_tail, history.history_file, args.recent)
+            
+            print(f"  {line_count:>11,} lines ({size_mb:7.1f} MB): tail reader {tail:8.3f} ms, "
+                  f"readlines {full:10.1f} ms")
+
+if __name__ == '__main__':
+    main()
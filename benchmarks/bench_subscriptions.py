@@ -0,0 +1,98 @@
+"""
+Benchmark: indexed alert subscriptions
+Author: Mindy Stricklin
+
+Loads synthetic subscribers (spread over many cities, a few watching
+every city) into AlertSubscriptions and times the bulk load, reloading
+and indexing, single changes, and matching observations against the
+index versus a loop over every subscriber. Results are checked equal.
+
+    python -m benchmarks.bench_subscriptions --subscriptions 100000
+"""
+
+import time
+import random
+import argparse
+import tempfile
+
+from features.weather_alerts import AlertEvaluator
+from features.alert_subscriptions import AlertSubscriptions
+
+CONDITIONS = ['Clear', 'Clouds', 'Rain', 'Light Rain', 'Snow', 'Thunderstorm', 'Mist']
+PATTERNS = ['rain', 'snow', 'storm', 'mist']
+
+def make_subscriptions(count, city_count, rng, every_city_share=0.03):
+    """Build count synthetic subscription dicts"""
+    subscriptions = []
+    for number in range(count):
+        cities = [] if rng.random() < every_city_share else [f"City{rng.randrange(city_count)}"]
+        subscriptions.append({
+            'name': f"user{number}",
+            'temperature_threshold_high': rng.randint(80, 110),
+            'temperature_threshold_low': rng.randint(-10, 35),
+            'condition_alerts': rng.sample(PATTERNS, rng.randint(0, 2)),
+            'cities': cities,
+            'enabled': True
+        })
+    return subscriptions
+
+def match_by_loop(subscriptions, city, temp, condition):
+    """Check every subscriber in turn, as a single-preference store would"""
+    alerts = {}
+    for sub_id, subscription in subscriptions.items():
+        cities = [name.strip().lower() for name in subscription.get('cities') or []]
+        if cities and city.strip().lower() not in cities:
+            continue
+        messages = AlertEvaluator(subscription).check(temp, condition)
+        if messages:
+            alerts[sub_id] = messages
+    return alerts
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--subscriptions', type=int, default=100000)
+    parser.add_argument('--cities', type=int, default=200)
+    parser.add_argument('--observations', type=int, default=50)
+    parser.add_argument('--changes', type=int, default=1000)
+    args = parser.parse_args(argv)
+    rng = random.Random(7)
+    
+    with tempfile.TemporaryDirectory() as folder:
+        store = AlertSubscriptions(folder)
+        start = time.perf_counter()
+        store.add_subscriptions(make_subscriptions(args.subscriptions, args.cities, rng))
+        bulk = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        store = AlertSubscriptions(folder)
+        reload = time.perf_counter() - start
+        
+        observations = [(f"City{rng.randrange(args.cities)}", rng.randint(-20, 115),
+                         rng.choice(CONDITIONS)) for _ in range(args.observations)]
+        
+        start = time.perf_counter()
+        indexed = [store.match(*observation) for observation in observations]
+        match_indexed = (time.perf_counter() - start) * 1000 / len(observations)
+        
+        loop_count = min(len(observations), 5)
+        start = time.perf_counter()
+        looped = [match_by_loop(store.subscriptions, *observation) for observation in observations[:loop_count]]
+        match_loop = (time.perf_counter() - start) * 1000 / loop_count
+        assert looped == indexed[:loop_count], "indexed and looped matches differ"
+        alerted = sum(len(alerts) for alerts in indexed) / len(indexed)
+        
+        sub_ids = rng.sample(sorted(store.subscriptions), args.changes)
+        start = time.perf_counter()
+        for sub_id in sub_ids:
+            store.update_subscription(sub_id, temperature_threshold_high=rng.randint(80, 110))
+        change = (time.perf_counter() - start) * 1000 / len(sub_ids)
+        store.wait_for_compaction()
+    
+    print(f"{args.subscriptions:,} subscriptions over {args.cities} cities")
+    print(f"  bulk add and save: {bulk:.2f}s, reload and index: {reload:.2f}s")
+    print(f"  match: {match_loop:.1f} ms looping, {match_indexed:.2f} ms indexed "
+          f"({alerted:.0f} subscribers alerted per observation)")
+    print(f"  update_subscription: {change:.3f} ms per change")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark: pooled HTTPTransport vs bare requests.get
+Author: Mindy Stricklin
+
+Sends sequential GETs to a local HTTP/1.1 stub server, first with a
+new connection per request (bare requests.get) and then through one
+pooled keep-alive HTTPTransport, and reports the latency per request.
+Loopback has no TLS, so real API savings are larger.
+
+    python -m benchmarks.bench_transport --requests 500
+"""
+
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from utils.http_transport import HTTPTransport
+
+BODY = json.dumps({
+    'name': 'Austin',
+    'sys': {'country': 'US'},
+    'main': {'temp': 70, 'feels_like': 71, 'humidity': 40, 'pressure': 1012},
+    'weather': [{'main': 'Clear', 'description': 'clear sky'}]
+}).encode('utf-8')
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers every GET with the same small weather response"""
+    
+    protocol_version = 'HTTP/1.1'  # Keep connections open between requests
+    disable_nagle_algorithm = True  # Headers and body go out as separate writes
+    
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+    
+    def log_message(self, format, *args):
+        pass
+
+def time_requests(get, url, count):
+    """Send count GETs with get(url, params) and return ms per request"""
+    params = {'q': 'Austin', 'units': 'imperial'}
+    get(url, params)  # Warm up
+    
+    start = time.perf_counter()
+    for _ in range(count):
+        response = get(url, params)
+        response.raise_for_status()
+        response.json()
+    return (time.perf_counter() - start) * 1000 / count
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=500, help="GETs per client")
+    args = parser.parse_args(argv)
+    
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/data/2.5/weather"
+    
+    try:
+        bare = time_requests(lambda url, params: requests.get(url, params=params, timeout=10),
+                             url, args.requests)
+        
+        transport = HTTPTransport()
+        try:
+            pooled = time_requests(lambda url, params: transport.get(url, params=params),
+                                   url, args.requests)
+        finally:
+            transport.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+    
+    print(f"{args.requests} sequential GETs over loopback")
+    print(f"  bare requests.get: {bare:.2f} ms/request")
+    print(f"  pooled transport:  {pooled:.2f} ms/request ({bare / pooled:.1f}x)")
+
+if __name__ == '__main__':
+    main()
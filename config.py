@@ -20,6 +20,41 @@ class Config:
         self.history_file = 'weather_history.txt'
         self.journal_file = 'journal_entries.json'
         self.alerts_file = 'alert_preferences.json'
+        self.history_backend = 'text'  # text, columnar or sqlite
+        self.history_rotation = None  # None, 'month' or 'size'; text backend only
+        self.history_rotation_size = 64 * 1024 * 1024  # bytes, for 'size' rotation
+        self.history_compression = 'gzip'  # gzip or lzma, for closed segments
+        self.lock_files = False  # advisory file locks when several processes share data/
+        
+        # API response cache
+        self.cache_file = 'api_cache.json'
+        self.cache_max_entries = 256
+        self.cache_ttl_current = 600  # seconds
+        self.cache_ttl_forecast = 1800  # seconds
+        self.cache_on_disk = True
+        
+        # HTTP connection pool
+        self.http_pool_size = 10
+        self.http_connect_timeout = 3.05  # seconds
+        self.http_read_timeout = 10  # seconds
+        self.http_keep_alive = True
+        
+        # API rate limiting (free tier allows 60 calls/minute)
+        self.requests_per_minute = 60
+        self.rate_limit_burst = 5
+        
+        # Background workers for the Tk interface
+        self.ui_worker_threads = 4
+        self.ui_poll_interval_ms = 100
+        
+        # Background polling of a watch list: comma-separated WATCH_CITIES
+        # entries of City:STATE (e.g. Austin:TX), giving (city, state) pairs
+        self.watch_cities = [(entry.partition(':')[0].strip(), entry.partition(':')[2].strip())
+                             for entry in os.getenv('WATCH_CITIES', '').split(',')
+                             if entry.partition(':')[0].strip()]
+        self.poll_min_interval = 600  # seconds; at least the current weather cache TTL
+        self.poll_max_interval = 3600  # seconds
+        self.poll_max_share = 0.5  # fraction of the API quota background polls may use
         
     def get_api_key(self):
         """Get the OpenWeatherMap API key"""
@@ -46,3 +81,15 @@ class Config:
     def get_alerts_file_path(self):
         """Get the full path to the alerts preferences file"""
         return self.get_data_file_path(self.alerts_file)
+    
+    def get_cache_file_path(self):
+        """Get the full path to the API response cache file"""
+        return self.get_data_file_path(self.cache_file)
+    
+    def get_cache_ttls(self):
+        """Get the cache time-to-live in seconds for each API endpoint"""
+        return {
+            'weather': self.cache_ttl_current,
+            'group': self.cache_ttl_current,
+            'forecast': self.cache_ttl_forecast
+        }
@@ -0,0 +1,349 @@
+"""
+Feature: Alert Subscriptions
+- Alert thresholds, conditions and cities for many subscribers
+Author: Mindy Stricklin
+"""
+
+import os
+import math
+import bisect
+import threading
+
+from features.weather_alerts import AlertEvaluator
+from utils.snapshot_log import SnapshotLog
+
+class AlertSubscriptions:
+    """
+    Stores many subscribers' alert preferences and indexes them so the
+    subscribers an observation alerts are found without looking at the
+    others. For each city (and for subscribers watching every city)
+    the high and low thresholds are kept in sorted lists, so the
+    subscribers whose threshold a temperature crosses are one binary
+    search away, and each condition pattern maps to its subscribers.
+    Matching an observation costs O(log n + k) for k alerts.
+    
+    alert_subscriptions.json is a snapshot; each add, update or removal
+    only appends a record to alert_subscriptions_log.jsonl, and the log
+    is folded back into the snapshot in the background once it holds
+    compact_after records.
+    """
+    
+    def __init__(self, data_folder='data', lock_files=False, compact_after=1000):
+        self.data_folder = data_folder
+        self.subscriptions_file = os.path.join(data_folder, 'alert_subscriptions.json')
+        self.log_file = os.path.join(data_folder, 'alert_subscriptions_log.jsonl')
+        self.lock_files = lock_files
+        self.compact_after = compact_after
+        self.ensure_data_folder()
+        self.log = SnapshotLog(self.subscriptions_file, self.log_file, lock_files=lock_files)
+        self._compaction_thread = None
+        self._compaction_lock = threading.Lock()
+        self.load_subscriptions()
+    
+    def ensure_data_folder(self):
+        """Create data folder if it doesn't exist"""
+        if not os.path.exists(self.data_folder):
+            os.makedirs(self.data_folder)
+    
+    @staticmethod
+    def _empty():
+        return {'next_id': 1, 'subscriptions': []}
+    
+    @staticmethod
+    def _replay(stored, records):
+        """Apply logged add/update/remove records to a stored snapshot"""
+        subscriptions = {subscription['id']: subscription for subscription in stored['subscriptions']}
+        next_id = stored['next_id']
+        
+        for record in records:
+            op = record.get('op')
+            
+            if op == 'add':
+                subscription = record['subscription']
+                subscriptions[subscription['id']] = subscription
+                next_id = max(next_id, subscription['id'] + 1)
+            
+            elif op == 'update':
+                if record['id'] in subscriptions:
+                    subscriptions[record['id']].update(record['changes'])
+            
+            elif op == 'remove':
+                subscriptions.pop(record['id'], None)
+        
+        return {'next_id': next_id, 'subscriptions': list(subscriptions.values())}
+    
+    def load_subscriptions(self):
+        """Load subscriptions from the snapshot and log and index them"""
+        self.subscriptions = {}
+        self.next_id = 1
+        try:
+            stored, records = self.log.read(default=self._empty())
+            stored = self._replay(stored, records)
+            self.next_id = stored['next_id']
+            for subscription in stored['subscriptions']:
+                self.subscriptions[subscription['id']] = subscription
+        except Exception as e:
+            print(f"Error loading alert subscriptions: {str(e)}")
+            self.subscriptions = {}
+        self.rebuild_index()
+    
+    def save_subscriptions(self):
+        """Write every subscription to a new snapshot, replacing the log"""
+        try:
+            self.log.write_snapshot({
+                'next_id': self.next_id,
+                'subscriptions': list(self.subscriptions.values())
+            })
+            return True
+        except Exception as e:
+            print(f"Error saving alert subscriptions: {str(e)}")
+            return False
+    
+    def _log_change(self, record):
+        """Append one change to the log; returns False if it could not be written"""
+        try:
+            self.log.append(record)
+        except Exception as e:
+            print(f"Error saving alert subscriptions: {str(e)}")
+            return False
+        self._maybe_compact()
+        return True
+    
+    def compact(self):
+        """Fold the log into alert_subscriptions.json"""
+        try:
+            self.log.compact(self._replay, default=self._empty())
+            return True
+        except Exception as e:
+            print(f"Error compacting alert subscriptions: {str(e)}")
+            return False
+    
+    def _maybe_compact(self):
+        """Start a background compaction once the log has grown long enough"""
+        if self.log.log_records < self.compact_after:
+            return
+        
+        with self._compaction_lock:
+            if self._compaction_thread is not None and self._compaction_thread.is_alive():
+                return
+            self._compaction_thread = threading.Thread(target=self.compact, daemon=True)
+            self._compaction_thread.start()
+    
+    def wait_for_compaction(self):
+        """Block until a running background compaction has finished"""
+        thread = self._compaction_thread
+        if thread is not None:
+            thread.join()
+    
+    def rebuild_index(self):
+        """Index every enabled subscription from scratch"""
+        self._cities = {}
+        self._patterns = {}
+        self._pattern_matches = {}
+        
+        for subscription in self.subscriptions.values():
+            for city_index, key in self._city_indexes(subscription):
+                for side in ('high', 'low'):
+                    value = self._threshold(subscription, side)
+                    if value is not None:
+                        city_index[side][0].append((value, subscription['id']))
+                self._index_conditions(city_index, subscription)
+        
+        # Sort each threshold list once and split it into parallel lists
+        for city_index in self._cities.values():
+            for side in ('high', 'low'):
+                pairs = sorted(city_index[side][0])
+                city_index[side] = ([value for value, sub_id in pairs],
+                                    [sub_id for value, sub_id in pairs])
+    
+    @staticmethod
+    def _city_key(city):
+        """Index key for a city name; None stands for every city"""
+        return city.strip().lower() if city is not None else None
+    
+    def _city_indexes(self, subscription):
+        """Get (city index, key) for each city an enabled subscription watches"""
+        if not subscription.get('enabled', True):
+            return []
+        
+        keys = []
+        for city in subscription.get('cities') or [None]:
+            key = self._city_key(city)
+            if key not in keys:
+                keys.append(key)
+        
+        indexes = []
+        for key in keys:
+            if key not in self._cities:
+                self._cities[key] = {'high': ([], []), 'low': ([], []), 'conditions': {}}
+            indexes.append((self._cities[key], key))
+        return indexes
+    
+    @staticmethod
+    def _to_float(value):
+        """Convert a temperature or threshold to float, None if it is not a number"""
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return None
+        return None if math.isnan(value) else value
+    
+    def _threshold(self, subscription, side):
+        """Get a subscription's high or low threshold as a float, None if unset"""
+        return self._to_float(subscription.get(f"temperature_threshold_{side}"))
+    
+    def _index_conditions(self, city_index, subscription):
+        """Add a subscription's condition patterns to a city index"""
+        for pattern in subscription.get('condition_alerts', []):
+            pattern = pattern.lower()
+            subscribers = city_index['conditions'].setdefault(pattern, {})
+            subscribers[subscription['id']] = subscribers.get(subscription['id'], 0) + 1
+            
+            if pattern not in self._patterns:
+                self._pattern_matches = {}
+            self._patterns[pattern] = self._patterns.get(pattern, 0) + 1
+    
+    def _index(self, subscription):
+        """Add one subscription to the index"""
+        for city_index, key in self._city_indexes(subscription):
+            for side in ('high', 'low'):
+                value = self._threshold(subscription, side)
+                if value is not None:
+                    values, ids = city_index[side]
+                    position = bisect.bisect_right(values, value)
+                    values.insert(position, value)
+                    ids.insert(position, subscription['id'])
+            self._index_conditions(city_index, subscription)
+    
+    def _unindex(self, subscription):
+        """Remove one subscription from the index"""
+        for city_index, key in self._city_indexes(subscription):
+            for side in ('high', 'low'):
+                value = self._threshold(subscription, side)
+                if value is not None:
+                    values, ids = city_index[side]
+                    start = bisect.bisect_left(values, value)
+                    end = bisect.bisect_right(values, value)
+                    position = ids.index(subscription['id'], start, end)
+                    del values[position]
+                    del ids[position]
+            
+            for pattern in subscription.get('condition_alerts', []):
+                pattern = pattern.lower()
+                subscribers = city_index['conditions'].get(pattern)
+                if subscribers is not None:
+                    subscribers.pop(subscription['id'], None)
+                    if not subscribers:
+                        del city_index['conditions'][pattern]
+                
+                self._patterns[pattern] -= 1
+                if not self._patterns[pattern]:
+                    del self._patterns[pattern]
+                    self._pattern_matches = {}
+            
+            if not city_index['high'][0] and not city_index['low'][0] and not city_index['conditions']:
+                del self._cities[key]
+    
+    def add_subscription(self, name, high_temp=85, low_temp=32, conditions=None, cities=None,
+                         enabled=True):
+        """
+        Add a subscriber. cities limits the alerts to those cities;
+        None means every city. Returns the new subscription id
+        """
+        sub_id = self._add({
+            'name': name,
+            'temperature_threshold_high': high_temp,
+            'temperature_threshold_low': low_temp,
+            'condition_alerts': list(conditions) if conditions else [],
+            'cities': list(cities) if cities else [],
+            'enabled': enabled
+        })
+        self._log_change({'op': 'add', 'subscription': self.subscriptions[sub_id]})
+        return sub_id
+    
+    def add_subscriptions(self, subscriptions):
+        """Add many subscription dicts and save one snapshot; returns their ids"""
+        ids = [self._add(dict(subscription)) for subscription in subscriptions]
+        self.save_subscriptions()
+        return ids
+    
+    def _add(self, subscription):
+        """Give a subscription an id, store it and index it"""
+        subscription['id'] = self.next_id
+        self.next_id += 1
+        self.subscriptions[subscription['id']] = subscription
+        self._index(subscription)
+        return subscription['id']
+    
+    def update_subscription(self, sub_id, **changes):
+        """Change fields of a subscription, e.g. temperature_threshold_high=90"""
+        subscription = self.subscriptions.get(sub_id)
+        if subscription is None:
+            return False
+        
+        self._unindex(subscription)
+        changes.pop('id', None)
+        subscription.update(changes)
+        self._index(subscription)
+        return self._log_change({'op': 'update', 'id': sub_id, 'changes': changes})
+    
+    def remove_subscription(self, sub_id):
+        """Remove a subscription"""
+        subscription = self.subscriptions.pop(sub_id, None)
+        if subscription is None:
+            return False
+        
+        self._unindex(subscription)
+        return self._log_change({'op': 'remove', 'id': sub_id})
+    
+    def get_subscription(self, sub_id):
+        """Get a copy of one subscription"""
+        subscription = self.subscriptions.get(sub_id)
+        return dict(subscription) if subscription is not None else None
+    
+    def _matching_patterns(self, condition):
+        """Get the condition patterns contained in a condition string"""
+        patterns = self._pattern_matches.get(condition)
+        if patterns is None:
+            condition_lower = condition.lower()
+            patterns = [pattern for pattern in self._patterns if pattern in condition_lower]
+            self._pattern_matches[condition] = patterns
+        return patterns
+    
+    def match(self, city, temp, condition):
+        """
+        Find the subscribers an observation alerts.
+        Returns {subscription id: [alert messages]}
+        """
+        alerts = {}
+        temp_value = self._to_float(temp)
+        patterns = self._matching_patterns(condition)
+        
+        for key in (self._city_key(city), None):
+            city_index = self._cities.get(key)
+            if city_index is None:
+                continue
+            
+            if temp_value is not None:
+                # High thresholds at or below temp, then low thresholds
+                # at or above it for subscribers without a high alert
+                values, ids = city_index['high']
+                high_ids = ids[:bisect.bisect_right(values, temp_value)]
+                for sub_id in high_ids:
+                    threshold = self.subscriptions[sub_id]['temperature_threshold_high']
+                    alerts[sub_id] = [AlertEvaluator.high_alert(temp, threshold)]
+                
+                values, ids = city_index['low']
+                low_ids = ids[bisect.bisect_left(values, temp_value):]
+                if low_ids:
+                    high_ids = set(high_ids)
+                    for sub_id in low_ids:
+                        if sub_id not in high_ids:
+                            threshold = self.subscriptions[sub_id]['temperature_threshold_low']
+                            alerts[sub_id] = [AlertEvaluator.low_alert(temp, threshold)]
+            
+            for pattern in patterns:
+                for sub_id, count in city_index['conditions'].get(pattern, {}).items():
+                    alerts.setdefault(sub_id, []).extend([AlertEvaluator.condition_alert(condition)] * count)
+        
+        return alerts
@@ -0,0 +1,294 @@
+"""
+Feature: History Analytics
+- Rolling means, daily ranges, percentiles, pressure trends and
+  condition frequencies over the weather history
+Author: Mindy Stricklin
+"""
+
+from datetime import date
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+EPOCH = date(1970, 1, 1)
+
+class HistoryAnalytics:
+    """
+    Loads the weather history once into NumPy arrays and answers
+    analytics questions with vectorized group-by operations. With the
+    columnar backend the arrays are the memory-mapped columns themselves.
+    """
+    
+    def __init__(self, history):
+        if np is None:
+            raise ImportError("History analytics requires numpy (pip install numpy)")
+        
+        self.history = history
+        self.load()
+    
+    def load(self):
+        """(Re)load the history into arrays"""
+        store = self.history.store
+        if store is not None and hasattr(store, 'columns'):
+            self._load_columnar(store)
+        else:
+            self._load_records(self.history.iter_records())
+        
+        self.day_offset = int(self.days.min()) if len(self.days) else 0
+    
+    def _load_columnar(self, store):
+        """Use the columnar store's arrays directly"""
+        columns = store.columns()
+        self.days = columns['date']
+        self.temps = columns['temp']
+        self.pressures = columns['pressure']
+        self.conditions = columns['condition']
+        self.condition_names = list(store.dictionaries['condition'])
+        
+        # Analytics group by city name, so fold states into the city code
+        city_names = store.dictionaries['city']
+        state_names = store.dictionaries['state']
+        state_count = max(len(state_names), 1)
+        keys = columns['city'].astype(np.int64) * state_count + columns['state']
+        unique_keys, self.cities = np.unique(keys, return_inverse=True)
+        self.city_names = [
+            f"{city_names[key // state_count]}, {state_names[key % state_count]}"
+            for key in unique_keys.tolist()
+        ]
+    
+    def _load_records(self, records):
+        """Encode history record dicts into arrays"""
+        days = []
+        temps = []
+        pressures = []
+        cities = []
+        conditions = []
+        city_codes = {}
+        condition_codes = {}
+        
+        for record in records:
+            try:
+                day = (date.fromisoformat(record['date']) - EPOCH).days
+            except ValueError:
+                continue
+            
+            days.append(day)
+            temps.append(self._to_float(record['temp']))
+            pressures.append(self._to_float(record['pressure']))
+            cities.append(city_codes.setdefault(f"{record['city']}, {record['state']}",
+                                                len(city_codes)))
+            conditions.append(condition_codes.setdefault(record['condition'],
+                                                         len(condition_codes)))
+        
+        self.days = np.asarray(days, dtype=np.int32)
+        self.temps = np.asarray(temps, dtype=np.float64)
+        self.pressures = np.asarray(pressures, dtype=np.float64)
+        self.cities = np.asarray(cities, dtype=np.int64)
+        self.conditions = np.asarray(conditions, dtype=np.int64)
+        self.city_names = list(city_codes)
+        self.condition_names = list(condition_codes)
+    
+    @staticmethod
+    def _to_float(value):
+        """Convert a temperature or pressure to float, NaN if missing"""
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return float('nan')
+    
+    def _to_dates(self, days):
+        """Convert day numbers to datetime64[D]"""
+        return np.asarray(days, dtype=np.int64).astype('datetime64[D]')
+    
+    def _city_mask(self, city):
+        """Get a row mask for one 'City, ST' name, or every row"""
+        if city is None:
+            return slice(None)
+        if city not in self.city_names:
+            return np.zeros(len(self.days), dtype=bool)
+        return self.cities == self.city_names.index(city)
+    
+    def _daily_grid(self):
+        """
+        Get per-city daily temperature sums and counts as a
+        (cities x days) grid covering every day in the history
+        """
+        day_count = int(self.days.max()) - self.day_offset + 1
+        grid_shape = (len(self.city_names), day_count)
+        
+        valid = ~np.isnan(self.temps)
+        cells = np.ravel_multi_index(
+            (self.cities[valid], self.days[valid] - self.day_offset), grid_shape
+        )
+        cell_count = grid_shape[0] * grid_shape[1]
+        sums = np.bincount(cells, weights=self.temps[valid], minlength=cell_count)
+        counts = np.bincount(cells, minlength=cell_count)
+        return sums.reshape(grid_shape), counts.reshape(grid_shape)
+    
+    def daily_stats(self, city=None):
+        """
+        Get the mean, min and max temperature per city per day.
+        Returns a dict of parallel arrays: city, date, count, mean, min, max
+        """
+        rows = self._city_mask(city)
+        temps = np.asarray(self.temps[rows], dtype=np.float64)
+        valid = ~np.isnan(temps)
+        temps = temps[valid]
+        cities = np.asarray(self.cities[rows])[valid]
+        days = np.asarray(self.days[rows])[valid]
+        
+        if len(temps) == 0:
+            return {'city': [], 'date': self._to_dates([]), 'count': np.empty(0),
+                    'mean': np.empty(0), 'min': np.empty(0), 'max': np.empty(0)}
+        
+        # One integer key per (city, day) so a single sort groups the rows
+        day_offset = int(days.min())
+        day_count = int(days.max()) - day_offset + 1
+        keys = cities.astype(np.int64) * day_count + (days - day_offset)
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        temps = temps[order]
+        
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        counts = np.diff(np.r_[starts, len(keys)])
+        group_cities, group_days = np.divmod(keys[starts], day_count)
+        
+        return {
+            'city': [self.city_names[code] for code in group_cities.tolist()],
+            'date': self._to_dates(group_days + day_offset),
+            'count': counts,
+            'mean': np.add.reduceat(temps, starts) / counts,
+            'min': np.minimum.reduceat(temps, starts),
+            'max': np.maximum.reduceat(temps, starts)
+        }
+    
+    def rolling_means(self, windows=(7, 30)):
+        """
+        Get trailing rolling means of the daily mean temperature for each
+        city. Days without observations are skipped, not counted as zero.
+        Returns {'cities', 'dates', 'daily_mean', 'mean_<window>' ...} where
+        each series is a (cities x days) array
+        """
+        if len(self.days) == 0:
+            return {'cities': [], 'dates': self._to_dates([])}
+        
+        sums, counts = self._daily_grid()
+        has_data = counts > 0
+        daily_mean = np.divide(sums, counts, out=np.full(sums.shape, np.nan), where=has_data)
+        
+        # Prefix sums along the day axis turn each window into two lookups
+        mean_values = np.where(has_data, daily_mean, 0.0)
+        value_totals = np.concatenate([np.zeros((len(sums), 1)), np.cumsum(mean_values, axis=1)], axis=1)
+        day_totals = np.concatenate([np.zeros((len(sums), 1)), np.cumsum(has_data, axis=1)], axis=1)
+        
+        result = {
+            'cities': list(self.city_names),
+            'dates': self._to_dates(np.arange(sums.shape[1]) + self.day_offset),
+            'daily_mean': daily_mean
+        }
+        
+        for window in windows:
+            end = np.arange(1, sums.shape[1] + 1)
+            start = np.maximum(end - window, 0)
+            window_sums = value_totals[:, end] - value_totals[:, start]
+            window_days = day_totals[:, end] - day_totals[:, start]
+            result[f"mean_{window}"] = np.divide(
+                window_sums, window_days,
+                out=np.full(window_sums.shape, np.nan), where=window_days > 0
+            )
+        
+        return result
+    
+    def temperature_percentiles(self, percentiles=(10, 25, 50, 75, 90)):
+        """
+        Get temperature percentiles for each city (linear interpolation).
+        Returns {'cities': [...], 'percentiles': [...], 'values': cities x percentiles}
+        """
+        valid = ~np.isnan(self.temps)
+        temps = np.asarray(self.temps[valid], dtype=np.float64)
+        cities = np.asarray(self.cities[valid])
+        
+        # Sort by temperature, then stably by city, so each city's run is ordered
+        order = np.argsort(temps)
+        order = order[np.argsort(cities[order], kind='stable')]
+        temps = temps[order]
+        counts = np.bincount(cities, minlength=len(self.city_names))
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        
+        # Fractional rank of each percentile inside every city's sorted run
+        fractions = np.asarray(percentiles, dtype=np.float64) / 100.0
+        ranks = (counts[:, None] - 1) * fractions[None, :]
+        lower = np.floor(ranks).astype(np.int64)
+        upper = np.minimum(lower + 1, np.maximum(counts[:, None] - 1, 0))
+        weight = ranks - lower
+        
+        values = np.full(ranks.shape, np.nan)
+        has_data = counts > 0
+        low_values = temps[(starts[:, None] + lower)[has_data]]
+        high_values = temps[(starts[:, None] + upper)[has_data]]
+        values[has_data] = low_values + (high_values - low_values) * weight[has_data]
+        
+        return {
+            'cities': list(self.city_names),
+            'percentiles': list(percentiles),
+            'values': values
+        }
+    
+    def pressure_trends(self):
+        """
+        Get the least-squares pressure trend for each city in hPa per day.
+        Returns {'cities': [...], 'slope': array, 'count': array}
+        """
+        valid = ~np.isnan(self.pressures)
+        cities = np.asarray(self.cities[valid])
+        x = np.asarray(self.days[valid], dtype=np.float64) - self.day_offset
+        y = np.asarray(self.pressures[valid], dtype=np.float64)
+        city_count = len(self.city_names)
+        
+        n = np.bincount(cities, minlength=city_count).astype(np.float64)
+        sum_x = np.bincount(cities, weights=x, minlength=city_count)
+        sum_y = np.bincount(cities, weights=y, minlength=city_count)
+        sum_xy = np.bincount(cities, weights=x * y, minlength=city_count)
+        sum_xx = np.bincount(cities, weights=x * x, minlength=city_count)
+        
+        denominator = n * sum_xx - sum_x * sum_x
+        slope = np.divide(n * sum_xy - sum_x * sum_y, denominator,
+                          out=np.full(city_count, np.nan), where=denominator > 0)
+        
+        return {
+            'cities': list(self.city_names),
+            'slope': slope,
+            'count': n.astype(np.int64)
+        }
+    
+    def condition_frequencies(self):
+        """
+        Count conditions per city per month.
+        Returns {city: {'YYYY-MM': {condition: count}}}
+        """
+        if len(self.days) == 0:
+            return {}
+        
+        months = self._to_dates(self.days).astype('datetime64[M]').astype(np.int64)
+        month_offset = int(months.min())
+        month_count = int(months.max()) - month_offset + 1
+        shape = (len(self.city_names), month_count, len(self.condition_names))
+        
+        cells = np.ravel_multi_index(
+            (np.asarray(self.cities), months - month_offset, np.asarray(self.conditions)), shape
+        )
+        cell_ids, counts = np.unique(cells, return_counts=True)
+        city_codes, month_codes, condition_codes = np.unravel_index(cell_ids, shape)
+        
+        # Only the non-empty cells are visited here
+        frequencies = {}
+        month_labels = np.arange(month_count).astype('datetime64[M]') + np.timedelta64(month_offset, 'M')
+        for city, month, condition, count in zip(city_codes.tolist(), month_codes.tolist(),
+                                                 condition_codes.tolist(), counts.tolist()):
+            months_for_city = frequencies.setdefault(self.city_names[city], {})
+            conditions = months_for_city.setdefault(str(month_labels[month]), {})
+            conditions[self.condition_names[condition]] = count
+        
+        return frequencies
@@ -0,0 +1,227 @@
+"""
+Feature: Mood Analytics
+- Relates journal moods to temperature, condition and pressure
+Author: Mindy Stricklin
+"""
+
+import math
+
+class MoodAnalytics:
+    """
+    Joins journal moods with the weather recorded alongside them and
+    computes correlation tables, mood distributions per temperature band
+    and per condition, and monthly trends. The journal is read in a
+    single pass into running totals, so memory grows with the number of
+    moods, bands, conditions and months rather than with the entries.
+    
+    Entries without weather_data are filled in from the weather history:
+    they are counted per (date, mood) during the pass and then joined
+    with one scan of the history for just those dates.
+    """
+    
+    def __init__(self, journal, history=None, band_width=10):
+        self.journal = journal
+        self.history = history
+        self.band_width = band_width
+    
+    @staticmethod
+    def _to_float(value):
+        """Convert a temperature or pressure to float, None if missing"""
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return None
+        return None if math.isnan(value) else value
+    
+    def _temperature_band(self, temp):
+        """Label the temperature band a reading falls into, e.g. '60-69'"""
+        low = int(math.floor(temp / self.band_width) * self.band_width)
+        return f"{low}-{low + self.band_width - 1}"
+    
+    @staticmethod
+    def _empty_totals():
+        return {
+            'entries': 0,
+            'moods': {},
+            'temp': {'n': 0, 'sum': 0.0, 'sum_sq': 0.0, 'moods': {}},
+            'pressure': {'n': 0, 'sum': 0.0, 'sum_sq': 0.0, 'moods': {}},
+            'bands': {},
+            'conditions': {},
+            'months': {}
+        }
+    
+    @staticmethod
+    def _add_value(totals, mood, value, count):
+        """Fold a reading into the sums behind a mood's correlation"""
+        totals['n'] += count
+        totals['sum'] += value * count
+        totals['sum_sq'] += value * value * count
+        
+        # Per mood: entries and sum of readings
+        mood_sums = totals['moods'].setdefault(mood, [0, 0.0])
+        mood_sums[0] += count
+        mood_sums[1] += value * count
+    
+    def _add(self, totals, date, mood, weather, count=1):
+        """Fold count entries with one mood and weather into the totals"""
+        totals['entries'] += count
+        totals['moods'][mood] = totals['moods'].get(mood, 0) + count
+        
+        month = totals['months'].setdefault(date[:7], {'moods': {}, 'temp_n': 0, 'temp_sum': 0.0})
+        month['moods'][mood] = month['moods'].get(mood, 0) + count
+        
+        if weather is None:
+            return
+        
+        temp = self._to_float(weather.get('temperature'))
+        if temp is not None:
+            self._add_value(totals['temp'], mood, temp, count)
+            band = totals['bands'].setdefault(self._temperature_band(temp), {})
+            band[mood] = band.get(mood, 0) + count
+            month['temp_n'] += count
+            month['temp_sum'] += temp * count
+        
+        pressure = self._to_float(weather.get('pressure'))
+        if pressure is not None:
+            self._add_value(totals['pressure'], mood, pressure, count)
+        
+        condition = weather.get('condition')
+        if condition:
+            moods = totals['conditions'].setdefault(condition, {})
+            moods[mood] = moods.get(mood, 0) + count
+    
+    def _history_weather(self, dates, city=None):
+        """
+        Get the average temperature and pressure and the most common
+        condition in the weather history for each requested date
+        """
+        by_date = {}
+        if self.history is None or not dates:
+            return by_date
+        
+        for record in self.history.iter_records():
+            date = record['date']
+            if date not in dates or (city is not None and record['city'] != city):
+                continue
+            
+            day = by_date.setdefault(date, {'temp': [0, 0.0], 'pressure': [0, 0.0], 'conditions': {}})
+            for field in ('temp', 'pressure'):
+                value = self._to_float(record[field])
+                if value is not None:
+                    day[field][0] += 1
+                    day[field][1] += value
+            day['conditions'][record['condition']] = day['conditions'].get(record['condition'], 0) + 1
+        
+        weather = {}
+        for date, day in by_date.items():
+            weather[date] = {
+                'temperature': day['temp'][1] / day['temp'][0] if day['temp'][0] else None,
+                'pressure': day['pressure'][1] / day['pressure'][0] if day['pressure'][0] else None,
+                'condition': max(day['conditions'], key=day['conditions'].get)
+            }
+        return weather
+    
+    @staticmethod
+    def _correlation(totals, mood_sums):
+        """
+        Pearson correlation between a reading and being in one mood
+        (a 0/1 variable), from running sums
+        """
+        n = totals['n']
+        mood_n, mood_sum = mood_sums
+        
+        spread = n * totals['sum_sq'] - totals['sum'] ** 2
+        mood_spread = n * mood_n - mood_n ** 2
+        if spread <= 0 or mood_spread <= 0:
+            return None
+        return (n * mood_sum - totals['sum'] * mood_n) / math.sqrt(spread * mood_spread)
+    
+    def analyze(self, city=None):
+        """
+        Analyze every journal entry. city limits the history join to one
+        city. Returns a dict with 'entries', 'joined_from_history',
+        'without_weather', 'moods', 'correlations', 'temperature_bands',
+        'conditions' and 'monthly'
+        """
+        totals = self._empty_totals()
+        missing = {}
+        
+        for entry in self.journal.iter_entries():
+            mood = entry.get('mood') or 'Unknown'
+            weather = entry.get('weather_data')
+            if isinstance(weather, dict):
+                self._add(totals, entry['date'], mood, weather)
+            else:
+                # Joined with the history after the pass
+                key = (entry['date'], mood)
+                missing[key] = missing.get(key, 0) + 1
+        
+        history_weather = self._history_weather({date for date, mood in missing}, city)
+        joined = 0
+        for (date, mood), count in missing.items():
+            weather = history_weather.get(date)
+            if weather is not None:
+                joined += count
+            self._add(totals, date, mood, weather, count)
+        
+        return self._report(totals, joined, sum(missing.values()) - joined)
+    
+    def _report(self, totals, joined, without_weather):
+        """Turn running totals into the result tables"""
+        correlations = {}
+        for mood in totals['moods']:
+            row = {}
+            for field, name in (('temp', 'temperature'), ('pressure', 'pressure')):
+                mood_sums = totals[field]['moods'].get(mood)
+                if mood_sums is None:
+                    row[f"avg_{name}"] = None
+                    row[name] = None
+                else:
+                    row[f"avg_{name}"] = mood_sums[1] / mood_sums[0]
+                    row[name] = self._correlation(totals[field], mood_sums)
+            correlations[mood] = row
+        
+        monthly = {}
+        for month in sorted(totals['months']):
+            values = totals['months'][month]
+            monthly[month] = {
+                'moods': values['moods'],
+                'avg_temperature': values['temp_sum'] / values['temp_n'] if values['temp_n'] else None
+            }
+        
+        bands = sorted(totals['bands'], key=lambda band: int(band.rsplit('-', 1)[0]))
+        return {
+            'entries': totals['entries'],
+            'joined_from_history': joined,
+            'without_weather': without_weather,
+            'moods': totals['moods'],
+            'correlations': correlations,
+            'temperature_bands': {band: totals['bands'][band] for band in bands},
+            'conditions': totals['conditions'],
+            'monthly': monthly
+        }
+    
+    def get_summary(self, city=None):
+        """Get a text summary of how moods relate to the weather"""
+        results = self.analyze(city)
+        if not results['entries']:
+            return "No journal entries available"
+        
+        summary = f"""
+Mood and Weather:
+Entries: {results['entries']} ({results['joined_from_history']} matched from history, {results['without_weather']} without weather)
+Average Temperature and Correlation by Mood:
+"""
+        for mood, row in results['correlations'].items():
+            if row['avg_temperature'] is None:
+                summary += f"  {mood}: no temperature data\n"
+                continue
+            correlation = 'n/a' if row['temperature'] is None else f"{row['temperature']:+.2f}"
+            summary += f"  {mood}: {row['avg_temperature']:.1f}°F (r = {correlation})\n"
+        
+        summary += "Most Common Mood by Condition:\n"
+        for condition, moods in sorted(results['conditions'].items()):
+            mood = max(moods, key=moods.get)
+            summary += f"  {condition}: {mood} ({moods[mood]} of {sum(moods.values())})\n"
+        
+        return summary.strip()
@@ -4,14 +4,121 @@ Feature: Weather Alerts
 Author: Mindy Stricklin
 """
 
-import json
 import os
 from datetime import datetime
 
+from utils.atomic_file import atomic_write_json, read_json
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class AlertEvaluator:
+    """
+    Alert preferences compiled once: numeric thresholds, lowercased
+    condition patterns and a memo of the alerts each condition string
+    triggers. Build a new evaluator whenever the preferences change.
+    """
+    
+    # Condition strings come from a small vocabulary; the memo is
+    # cleared if it ever grows past this
+    MAX_CONDITIONS = 1024
+    
+    def __init__(self, preferences):
+        self.enabled = preferences.get('enabled', True)
+        self.high_temp = preferences.get('temperature_threshold_high', 85)
+        self.low_temp = preferences.get('temperature_threshold_low', 32)
+        self.high_value = self._to_float(self.high_temp)
+        self.low_value = self._to_float(self.low_temp)
+        self.patterns = [condition.lower() for condition in preferences.get('condition_alerts', [])]
+        self._condition_alerts = {}
+    
+    @staticmethod
+    def _to_float(temp):
+        """Convert a temperature to float, NaN if it is not a number"""
+        try:
+            return float(temp)
+        except (TypeError, ValueError):
+            return float('nan')
+    
+    @staticmethod
+    def high_alert(temp, threshold):
+        """Format a high temperature alert"""
+        return f"🔥 High Temperature Alert: {temp}°F (threshold: {threshold}°F)"
+    
+    @staticmethod
+    def low_alert(temp, threshold):
+        """Format a low temperature alert"""
+        return f"❄️ Low Temperature Alert: {temp}°F (threshold: {threshold}°F)"
+    
+    @staticmethod
+    def condition_alert(condition):
+        """Format a condition alert"""
+        return f"⚠️ Weather Alert: {condition} detected"
+    
+    def condition_alerts(self, condition):
+        """Get the alerts a condition triggers, one per matching pattern"""
+        alerts = self._condition_alerts.get(condition)
+        if alerts is None:
+            condition_lower = condition.lower()
+            alerts = tuple(self.condition_alert(condition)
+                           for pattern in self.patterns if pattern in condition_lower)
+            if len(self._condition_alerts) >= self.MAX_CONDITIONS:
+                self._condition_alerts.clear()
+            self._condition_alerts[condition] = alerts
+        return alerts
+    
+    def check(self, temp, condition):
+        """Get the alert messages for one observation"""
+        alerts = []
+        if not self.enabled:
+            return alerts
+        
+        temp_float = self._to_float(temp)
+        if temp_float >= self.high_value:
+            alerts.append(self.high_alert(temp, self.high_temp))
+        elif temp_float <= self.low_value:
+            alerts.append(self.low_alert(temp, self.low_temp))
+        
+        alerts.extend(self.condition_alerts(condition))
+        return alerts
+    
+    def check_batch(self, observations):
+        """
+        Get the alert messages for many (temp, condition) observations.
+        Thresholds are compared over the whole batch at once with NumPy
+        when it is installed, and each distinct condition is matched once.
+        """
+        observations = list(observations)
+        if not self.enabled:
+            return [[] for _ in observations]
+        
+        temps = [self._to_float(temp) for temp, condition in observations]
+        if np is not None:
+            values = np.asarray(temps, dtype=np.float64)
+            high = (values >= self.high_value).tolist()
+            low = (values <= self.low_value).tolist()
+        else:
+            high = [value >= self.high_value for value in temps]
+            low = [value <= self.low_value for value in temps]
+        
+        results = []
+        for (temp, condition), is_high, is_low in zip(observations, high, low):
+            alerts = []
+            if is_high:
+                alerts.append(self.high_alert(temp, self.high_temp))
+            elif is_low:
+                alerts.append(self.low_alert(temp, self.low_temp))
+            alerts.extend(self.condition_alerts(condition))
+            results.append(alerts)
+        return results
+
 class WeatherAlerts:
-    def __init__(self, data_folder='data'):
+    def __init__(self, data_folder='data', lock_files=False):
         self.data_folder = data_folder
         self.alerts_file = os.path.join(data_folder, 'alert_preferences.json')
+        self.lock_files = lock_files
         self.default_preferences = {
             'temperature_threshold_high': 85,
             'temperature_threshold_low': 32,
@@ -30,20 +137,25 @@ class WeatherAlerts:
         """Load alert preferences from file"""
         try:
             if os.path.exists(self.alerts_file):
-                with open(self.alerts_file, 'r') as f:
-                    self.preferences = json.load(f)
+                self.preferences = read_json(self.alerts_file, lock=self.lock_files)
             else:
                 self.preferences = self.default_preferences.copy()
                 self.save_preferences()
         except Exception as e:
             print(f"Error loading alert preferences: {str(e)}")
             self.preferences = self.default_preferences.copy()
+        self.compile_preferences()
+    
+    def compile_preferences(self):
+        """Rebuild the alert evaluator from the current preferences"""
+        self.evaluator = AlertEvaluator(self.preferences)
     
     def save_preferences(self):
         """Save alert preferences to file"""
+        # Every preference setter saves, so this is where changes land
+        self.compile_preferences()
         try:
-            with open(self.alerts_file, 'w') as f:
-                json.dump(self.preferences, f, indent=2)
+            atomic_write_json(self.alerts_file, self.preferences, indent=2, lock=self.lock_files)
             return True
         except Exception as e:
             print(f"Error saving alert preferences: {str(e)}")
@@ -54,33 +166,15 @@ class WeatherAlerts:
         Check if current weather conditions trigger any alerts
         Returns a list of alert messages
         """
-        alerts = []
-        
-        if not self.preferences.get('enabled', True):
-            return alerts
-        
-        # Temperature alerts
-        high_temp = self.preferences.get('temperature_threshold_high', 85)
-        low_temp = self.preferences.get('temperature_threshold_low', 32)
-        
-        try:
-            temp_float = float(temp)
-            if temp_float >= high_temp:
-                alerts.append(f"🔥 High Temperature Alert: {temp}°F (threshold: {high_temp}°F)")
-            elif temp_float <= low_temp:
-                alerts.append(f"❄️ Low Temperature Alert: {temp}°F (threshold: {low_temp}°F)")
-        except ValueError:
-            pass
-        
-        # Condition alerts
-        condition_alerts = self.preferences.get('condition_alerts', [])
-        condition_lower = condition.lower()
-        
-        for alert_condition in condition_alerts:
-            if alert_condition.lower() in condition_lower:
-                alerts.append(f"⚠️ Weather Alert: {condition} detected")
-        
-        return alerts
+        return self.evaluator.check(temp, condition)
+    
+    def check_alerts_batch(self, observations):
+        """
+        Check many observations at once, e.g. every city in a refresh.
+        observations is a list of (temp, condition) pairs; returns a list
+        of alert message lists in the same order
+        """
+        return self.evaluator.check_batch(observations)
     
     def set_temperature_thresholds(self, high_temp, low_temp):
         """Set temperature alert thresholds"""
@@ -8,10 +8,13 @@ import requests
 import json
 from datetime import datetime
 
+from utils.http_transport import get_shared_transport
+
 class WeatherDisplay:
-    def __init__(self, api_key):
+    def __init__(self, api_key, transport=None):
         self.api_key = api_key
         self.base_url = "https://api.openweathermap.org/data/2.5/weather"
+        self.transport = transport if transport is not None else get_shared_transport()
     
     def get_current_weather(self, city):
         """
@@ -26,7 +29,7 @@ class WeatherDisplay:
             }
             
             # Make API request
-            response = requests.get(self.base_url, params=params)
+            response = self.transport.get(self.base_url, params=params)
             response.raise_for_status()
             
             # Parse JSON response
@@ -76,7 +79,7 @@ Last Updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
                 'appid': self.api_key,
                 'units': 'imperial'
             }
-            response = requests.get(self.base_url, params=test_params)
+            response = self.transport.get(self.base_url, params=test_params)
             return response.status_code == 200
         except:
             return False
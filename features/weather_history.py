@@ -5,19 +5,178 @@ Author: Mindy Stricklin
 """
 
 import os
+import csv
+import math
+import itertools
+import threading
+from collections import deque
 from datetime import datetime
 
+from utils.history_stats import HistoryStats
+from utils.history_segments import HistorySegments
+
 class WeatherHistory:
-    def __init__(self, data_folder='data'):
+    # Column order used by the text history file and CSV imports
+    FIELDS = ('date', 'city', 'state', 'temp', 'condition', 'pressure')
+    # Other names CSV headers use for those columns
+    COLUMN_ALIASES = {'temperature': 'temp', 'country': 'state', 'weather': 'condition'}
+    
+    def __init__(self, data_folder='data', backend='text', flush_every=1000, fsync_policy='end',
+                 stats_save_every=100, rotation=None, rotation_size=64 * 1024 * 1024,
+                 compression='gzip'):
+        if rotation not in (None, 'month', 'size'):
+            raise ValueError(f"Unknown history rotation: {rotation}")
         self.data_folder = data_folder
         self.history_file = os.path.join(data_folder, 'weather_history.txt')
+        self.backend = backend
+        self.flush_every = flush_every
+        self.fsync_policy = fsync_policy  # 'never', 'end' or 'flush'
+        self.stats_save_every = stats_save_every
+        self.rotation = rotation  # None, 'month' or 'size' (text backend only)
+        self.rotation_size = rotation_size
         self.ensure_data_folder()
+        self.store = self._create_store()
+        self.segments = HistorySegments(os.path.join(data_folder, 'history_segments'), compression)
+        self.stats = HistoryStats(os.path.join(data_folder, 'history_stats.json'))
+        self._stats_loaded = False
+        self._active_month = None
+        self._lock = threading.Lock()
     
     def ensure_data_folder(self):
         """Create data folder if it doesn't exist"""
         if not os.path.exists(self.data_folder):
             os.makedirs(self.data_folder)
     
+    def _create_store(self):
+        """Create the storage backend; the text backend uses the file directly"""
+        if self.backend == 'text':
+            return None
+        if self.backend == 'columnar':
+            from utils.columnar_history import ColumnarHistoryStore
+            return ColumnarHistoryStore(os.path.join(self.data_folder, 'history_columns'))
+        if self.backend == 'sqlite':
+            from utils.sqlite_history import SQLiteHistoryStore
+            return SQLiteHistoryStore(os.path.join(self.data_folder, 'weather_history.db'))
+        raise ValueError(f"Unknown history backend: {self.backend}")
+    
+    def convert_to_columnar(self):
+        """
+        Copy the text history file into a columnar store and switch
+        this instance over to it. The text history is left in place.
+        Raises ValueError if the columnar store already holds records,
+        so converting twice cannot duplicate them.
+        Returns the number of records converted.
+        """
+        from utils.columnar_history import convert_text_history
+        
+        folder = os.path.join(self.data_folder, 'history_columns')
+        count = convert_text_history(self._iter_text_lines(), folder)
+        
+        self.backend = 'columnar'
+        self.store = self._create_store()
+        return count
+    
+    def convert_to_sqlite(self, batch_size=10000):
+        """
+        Copy the text history file into a SQLite database and switch
+        this instance over to it. The text history is left in place.
+        Raises ValueError if the database already holds records, so
+        converting twice cannot duplicate them.
+        Returns the number of records converted.
+        """
+        from utils.sqlite_history import SQLiteHistoryStore
+        
+        store = SQLiteHistoryStore(os.path.join(self.data_folder, 'weather_history.db'))
+        if len(store):
+            store.close()
+            raise ValueError("The SQLite history already holds records; clear it before converting")
+        
+        self.backend = 'sqlite'
+        self.store = store
+        
+        count = 0
+        batch = []
+        for record in self._iter_text_records():
+            batch.append((record['date'], record['city'], record['state'],
+                          record['temp'], record['condition'], record['pressure']))
+            if len(batch) >= batch_size:
+                count += self.store.append_many(batch)
+                batch = []
+        
+        count += self.store.append_many(batch)
+        return count
+    
+    def _iter_text_lines(self, segments=None):
+        """
+        Yield the lines of the given history segments (default all),
+        then those of the active text history file
+        """
+        yield from self.segments.iter_lines(segments)
+        
+        if os.path.exists(self.history_file):
+            with open(self.history_file, 'r') as f:
+                yield from f
+    
+    def _iter_text_records(self, segments=None):
+        """Yield every record in the text history, oldest first"""
+        for line in self._iter_text_lines(segments):
+            record = self._parse_record(line)
+            if record:
+                yield record
+    
+    def _history_files(self):
+        """Get every file holding text history, segments first"""
+        return self.segments.paths() + [self.history_file]
+    
+    def _should_rotate(self, date_str, size):
+        """
+        Check whether the active file must be closed into a segment
+        before a record dated date_str is appended to its size bytes
+        """
+        if self.rotation is None:
+            return False
+        if not size:
+            self._active_month = date_str[:7]  # This record starts the file
+            return False
+        if self.rotation == 'size':
+            return size >= self.rotation_size
+        
+        if self._active_month is None:
+            with open(self.history_file, 'r') as f:
+                self._active_month = f.readline()[:7]
+        # Records dated earlier than the file's month stay in it
+        return date_str[:7] > self._active_month
+    
+    def _rotate(self, stats, next_date=None):
+        """
+        Close the active file into a compressed segment (lock must be
+        held, and stats must cover every record written so far).
+        next_date is the date of the record that will start the new file
+        """
+        self.segments.close_segment(self.history_file)
+        self._active_month = next_date[:7] if next_date else None
+        # The records only moved, so the aggregates hold; re-fingerprint them
+        stats.save(self._history_files())
+    
+    def rotate(self):
+        """
+        Close the active history file into a compressed segment now.
+        Returns the new segment's index entry, or None if there was nothing to close
+        """
+        try:
+            with self._lock:
+                if self.store is not None or not os.path.exists(self.history_file):
+                    return None
+                if not os.path.getsize(self.history_file):
+                    return None
+                
+                stats = self._current_stats()
+                self._rotate(stats)
+                return self.segments.segments[-1]
+        except Exception as e:
+            print(f"Error rotating weather history: {str(e)}")
+            return None
+    
     def add_weather_record(self, city, state, temp, condition, pressure=None):
         """
         Add a weather record to the history file
@@ -25,12 +184,33 @@ class WeatherHistory:
         """
         try:
             date_str = datetime.now().strftime('%Y-%m-%d')
-            pressure_str = str(pressure) if pressure else 'N/A'
             
-            record = f"{date_str},{city},{state},{temp},{condition},{pressure_str}\n"
+            if self.store is not None:
+                self.store.append(date_str, city, state, temp, condition, pressure)
+                return True
+            
+            record = self._format_line(date_str, city, state, temp, condition, pressure)
             
-            with open(self.history_file, 'a') as f:
-                f.write(record)
+            with self._lock:
+                stats = self._current_stats()
+                
+                size = os.path.getsize(self.history_file) if os.path.exists(self.history_file) else 0
+                if self._should_rotate(date_str, size):
+                    self._rotate(stats, date_str)
+                
+                with open(self.history_file, 'a') as f:
+                    f.write(record)
+                
+                # Parse the line back so the stats match what a rebuild would see
+                parsed = self._parse_record(record)
+                if parsed:
+                    stats.add(parsed)
+                
+                # The sidecar is written every few records rather than every
+                # time; if the process stops first, the next load rebuilds it
+                stats.mark_current(self._history_files())
+                if stats.unsaved_changes >= self.stats_save_every:
+                    stats.save()
             
             return True
             
@@ -38,33 +218,181 @@ class WeatherHistory:
             print(f"Error adding weather record: {str(e)}")
             return False
     
+    def _format_line(self, date_str, city, state, temp, condition, pressure):
+        """Format one record as a line of the text history file"""
+        pressure_str = str(pressure) if pressure else 'N/A'
+        return f"{date_str},{city},{state},{temp},{condition},{pressure_str}\n"
+    
+    def add_weather_records(self, records, flush_every=None, fsync_policy=None):
+        """
+        Add many weather records at once. Accepts any iterable (including
+        generators) of dicts with city, state, temp, condition and optional
+        date and pressure. Records are written in chunks of flush_every, so
+        memory stays flat however many records are ingested.
+        fsync_policy: 'never', 'end' (once after the last chunk) or
+        'flush' (after every chunk). With rotation set, the active file
+        is closed into a segment whenever a record calls for it.
+        Records without a YYYY-MM-DD date or a numeric temp are skipped.
+        Returns the number of records written.
+        """
+        flush_every = flush_every or self.flush_every
+        fsync_policy = fsync_policy or self.fsync_policy
+        today = datetime.now().strftime('%Y-%m-%d')
+        written = 0
+        
+        def rows():
+            valid_dates = {today}
+            skipped = 0
+            for record in records:
+                date_str = record.get('date') or today
+                if date_str not in valid_dates:
+                    if not self._is_valid_date(date_str):
+                        skipped += 1
+                        continue
+                    valid_dates.add(date_str)
+                
+                try:
+                    float(record['temp'])
+                except (TypeError, ValueError):
+                    skipped += 1
+                    continue
+                
+                yield (date_str, record['city'], record.get('state', ''),
+                       record['temp'], record.get('condition', ''), record.get('pressure'))
+            
+            if skipped:
+                print(f"Skipped {skipped} weather records with an invalid date or temperature")
+        
+        try:
+            if self.store is not None:
+                chunk = []
+                for row in rows():
+                    chunk.append(row)
+                    if len(chunk) >= flush_every:
+                        written += self.store.append_many(chunk)
+                        chunk = []
+                written += self.store.append_many(chunk)
+                return written
+            
+            with self._lock:
+                stats = self._current_stats()
+                
+                f = open(self.history_file, 'a', buffering=1024 * 1024)
+                try:
+                    size = f.tell()
+                    for row in rows():
+                        if self._should_rotate(row[0], size):
+                            f.close()
+                            self._rotate(stats, row[0])
+                            f = open(self.history_file, 'a', buffering=1024 * 1024)
+                            size = 0
+                        
+                        line = self._format_line(*row)
+                        f.write(line)
+                        size += len(line)
+                        
+                        parsed = self._parse_record(line)
+                        if parsed:
+                            stats.add(parsed)
+                        written += 1
+                        
+                        if written % flush_every == 0:
+                            f.flush()
+                            if fsync_policy == 'flush':
+                                os.fsync(f.fileno())
+                    
+                    f.flush()
+                    if fsync_policy in ('flush', 'end'):
+                        os.fsync(f.fileno())
+                finally:
+                    f.close()
+                
+                stats.save(self._history_files())
+            
+            return written
+            
+        except Exception as e:
+            print(f"Error adding weather records: {str(e)}")
+            # Anything already on disk is picked up by a stats rebuild
+            self.stats.fingerprint = None
+            return written
+    
+    def import_csv(self, csv_path, flush_every=None, fsync_policy=None):
+        """
+        Stream an external CSV dump into the history. A first row whose
+        first field is not a date is a header; its column names (date,
+        city, state, temp, condition, pressure, or an alias such as
+        temperature) are used when they name city and temp, otherwise
+        columns are read in that order. Invalid rows are skipped.
+        Returns the number of records imported.
+        """
+        def read_rows():
+            with open(csv_path, 'r', newline='') as f:
+                reader = csv.reader(f)
+                header = next(reader, None)
+                if header is None:
+                    return
+                
+                columns = list(self.FIELDS)
+                min_fields = 5
+                if header and self._is_valid_date(header[0].strip()):
+                    # No header: the first row is data
+                    reader = itertools.chain([header], reader)
+                else:
+                    names = [name.strip().lower() for name in header]
+                    names = [self.COLUMN_ALIASES.get(name, name) for name in names]
+                    if 'city' in names and 'temp' in names:
+                        columns = names
+                        min_fields = len(names)
+                
+                for row in reader:
+                    if len(row) < min_fields:
+                        continue
+                    yield dict(zip(columns, (value.strip() for value in row)))
+        
+        return self.add_weather_records(read_rows(), flush_every, fsync_policy)
+    
+    @staticmethod
+    def _is_valid_date(date_str):
+        """Check that a date is in YYYY-MM-DD form"""
+        try:
+            datetime.strptime(date_str, '%Y-%m-%d')
+            return True
+        except (TypeError, ValueError):
+            return False
+    
     def get_recent_history(self, days=7):
         """
         Get weather history for the last N days
         """
         try:
-            if not os.path.exists(self.history_file):
-                return []
+            if self.store is not None:
+                return self.store.tail(days)
             
+            # Walk backwards from the end of the file so only the last
+            # 'days' records are read, however large the history gets
             history = []
-            with open(self.history_file, 'r') as f:
-                lines = f.readlines()
-                # Get the last 'days' number of lines
-                recent_lines = lines[-days:] if len(lines) > days else lines
-                
-                for line in recent_lines:
-                    line = line.strip()
-                    if line:
-                        parts = line.split(',')
-                        if len(parts) >= 5:
-                            history.append({
-                                'date': parts[0],
-                                'city': parts[1],
-                                'state': parts[2],
-                                'temp': parts[3],
-                                'condition': parts[4],
-                                'pressure': parts[5] if len(parts) > 5 else 'N/A'
-                            })
+            if os.path.exists(self.history_file):
+                for line in self._iter_lines_reversed(self.history_file):
+                    if len(history) >= days:
+                        break
+                    
+                    record = self._parse_record(line)
+                    if record:
+                        history.append(record)
+            history.reverse()
+            
+            # Then take what is missing from the newest segments, keeping
+            # only the last records of each while it is decompressed
+            for segment in reversed(self.segments.segments):
+                needed = days - len(history)
+                if needed <= 0:
+                    break
+                
+                older = deque(maxlen=needed)
+                for record in self._iter_segment_records(segment):
+                    older.append(record)
+                history[:0] = older
             
             return history
             
@@ -72,20 +400,158 @@ class WeatherHistory:
             print(f"Error reading weather history: {str(e)}")
             return []
     
-    def get_history_summary(self):
+    def _parse_record(self, line):
+        """Parse one history line into a record dict, or None if invalid"""
+        line = line.strip()
+        if not line:
+            return None
+        
+        parts = line.split(',')
+        if len(parts) < 5:
+            return None
+        
+        return {
+            'date': parts[0],
+            'city': parts[1],
+            'state': parts[2],
+            'temp': parts[3],
+            'condition': parts[4],
+            'pressure': parts[5] if len(parts) > 5 else 'N/A'
+        }
+    
+    def _iter_segment_records(self, segment):
+        """Yield the records of one history segment"""
+        for line in self.segments.iter_lines([segment]):
+            record = self._parse_record(line)
+            if record:
+                yield record
+    
+    def _iter_lines_reversed(self, file_path, block_size=8192):
         """
-        Get a summary of weather history
+        Yield the lines of a file from last to first, reading fixed-size
+        blocks backwards from the end instead of loading the whole file
         """
-        history = self.get_recent_history(30)  # Last 30 days
-        
-        if not history:
-            return "No weather history available"
+        with open(file_path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            remainder = b''
+            
+            while position > 0:
+                read_size = min(block_size, position)
+                position -= read_size
+                f.seek(position)
+                
+                lines = (f.read(read_size) + remainder).split(b'\n')
+                # The first piece may be the tail of a line that starts
+                # in an earlier block, so hold it back for the next read
+                remainder = lines.pop(0)
+                
+                for line in reversed(lines):
+                    yield line.decode('utf-8')
+            
+            yield remainder.decode('utf-8')
+    
+    def iter_records(self):
+        """
+        Yield every history record, oldest first, from whichever backend is in use
+        """
+        if self.store is not None:
+            return self.store.iter_records()
+        return self._iter_text_records()
+    
+    def get_range(self, city, start_date, end_date):
+        """
+        Get one city's records between two YYYY-MM-DD dates (inclusive)
+        """
+        try:
+            if self.store is not None:
+                return self.store.get_range(city, start_date, end_date)
+            
+            # Only segments whose index says they hold this city and dates are opened
+            segments = self.segments.select(start_date, end_date, city)
+            records = [record for record in self._iter_text_records(segments)
+                       if record['city'] == city and start_date <= record['date'] <= end_date]
+            return sorted(records, key=lambda record: record['date'])
+            
+        except Exception as e:
+            print(f"Error reading weather history: {str(e)}")
+            return []
+    
+    def get_city_stats(self):
+        """
+        Get per-city record counts, temperature stats and date span
+        """
+        try:
+            if self.store is not None:
+                return self.store.city_stats()
+            
+            # Running totals per city, so memory does not grow with the history
+            groups = {}
+            for record in self._iter_text_records():
+                key = (record['city'], record['state'])
+                group = groups.get(key)
+                if group is None:
+                    group = groups[key] = {'count': 0, 'temp_count': 0, 'temp_sum': 0.0,
+                                           'min_temp': None, 'max_temp': None,
+                                           'pressure_count': 0, 'pressure_sum': 0.0,
+                                           'first_date': record['date'], 'last_date': record['date']}
+                group['count'] += 1
+                group['first_date'] = min(group['first_date'], record['date'])
+                group['last_date'] = max(group['last_date'], record['date'])
+                
+                try:
+                    temp = float(record['temp'])
+                    group['temp_count'] += 1
+                    group['temp_sum'] += temp
+                    if group['min_temp'] is None or temp < group['min_temp']:
+                        group['min_temp'] = temp
+                    if group['max_temp'] is None or temp > group['max_temp']:
+                        group['max_temp'] = temp
+                except ValueError:
+                    pass
+                
+                try:
+                    group['pressure_sum'] += float(record['pressure'])
+                    group['pressure_count'] += 1
+                except ValueError:
+                    pass
+            
+            stats = []
+            for (city, state), group in sorted(groups.items()):
+                stats.append({
+                    'city': city,
+                    'state': state,
+                    'count': group['count'],
+                    'avg_temp': group['temp_sum'] / group['temp_count'] if group['temp_count'] else None,
+                    'min_temp': group['min_temp'],
+                    'max_temp': group['max_temp'],
+                    'avg_pressure': (group['pressure_sum'] / group['pressure_count']
+                                     if group['pressure_count'] else None),
+                    'first_date': group['first_date'],
+                    'last_date': group['last_date']
+                })
+            return stats
+            
+        except Exception as e:
+            print(f"Error reading weather history: {str(e)}")
+            return []
+    
+    def _summarize_recent(self, count):
+        """Get average temperature and condition counts for the last N records"""
+        if self.store is not None:
+            return self.store.summarize_recent(count)
         
-        total_records = len(history)
+        history = self.get_recent_history(count)
         
-        # Calculate average temperature
-        temps = [float(record['temp']) for record in history if record['temp'].replace('.', '').isdigit()]
-        avg_temp = sum(temps) / len(temps) if temps else 0
+        # Calculate average temperature, converting the way the other backends do
+        temps = []
+        for record in history:
+            try:
+                temp = float(record['temp'])
+            except ValueError:
+                continue
+            if not math.isnan(temp):
+                temps.append(temp)
         
         # Count conditions
         conditions = {}
@@ -93,6 +559,110 @@ class WeatherHistory:
             condition = record['condition']
             conditions[condition] = conditions.get(condition, 0) + 1
         
+        return {
+            'count': len(history),
+            'avg_temp': sum(temps) / len(temps) if temps else None,
+            'conditions': conditions
+        }
+    
+    def _current_stats(self):
+        """
+        Get the running statistics for the text history file, folding in
+        lines appended since the sidecar was saved, or rebuilding them if
+        the sidecar is missing or the files changed some other way
+        """
+        if not self._stats_loaded:
+            self.stats.load()
+            self._stats_loaded = True
+        
+        history_files = self._history_files()
+        if not self.stats.is_current(history_files):
+            offset = self.stats.appended_offset(history_files)
+            if offset is None:
+                self.stats.rebuild(self._iter_text_records(), history_files)
+            else:
+                with open(self.history_file, 'rb') as f:
+                    f.seek(offset)
+                    for line in f:
+                        record = self._parse_record(line.decode('utf-8', errors='replace'))
+                        if record:
+                            self.stats.add(record)
+            self.stats.save(history_files)
+        
+        return self.stats
+    
+    def get_statistics(self):
+        """
+        Get all-time statistics: count, average/min/max temperature,
+        condition counts, and the same for each 'city|state'
+        """
+        try:
+            if self.store is None:
+                with self._lock:
+                    stats = self._current_stats()
+                    if stats.unsaved_changes:
+                        stats.save()
+                    return stats.get_statistics()
+            
+            statistics = self.store.summarize()
+            statistics['cities'] = {}
+            # Grouped by (city, state), so same-named cities stay apart
+            conditions = self.store.city_conditions()
+            for city in self.store.city_stats():
+                key = f"{city['city']}|{city['state']}"
+                statistics['cities'][key] = {
+                    'count': city['count'],
+                    'avg_temp': city['avg_temp'],
+                    'min_temp': city['min_temp'],
+                    'max_temp': city['max_temp'],
+                    'conditions': conditions.get((city['city'], city['state']), {})
+                }
+            return statistics
+            
+        except Exception as e:
+            print(f"Error reading weather statistics: {str(e)}")
+            return None
+    
+    def get_overall_summary(self):
+        """
+        Get a summary of the entire weather history
+        """
+        statistics = self.get_statistics()
+        
+        if not statistics or not statistics['count']:
+            return "No weather history available"
+        
+        conditions = statistics['conditions']
+        most_common_condition = max(conditions, key=conditions.get) if conditions else "Unknown"
+        
+        if statistics['avg_temp'] is not None:
+            temperature_line = (f"Average Temperature: {statistics['avg_temp']:.1f}°F "
+                                f"(range {statistics['min_temp']:.1f}°F to {statistics['max_temp']:.1f}°F)")
+        else:
+            temperature_line = "Average Temperature: N/A"
+        
+        summary = f"""
+Weather History Summary (All {statistics['count']} records):
+{temperature_line}
+Most Common Condition: {most_common_condition}
+Cities Tracked: {len(statistics['cities'])}
+        """
+        
+        return summary.strip()
+    
+    def get_history_summary(self):
+        """
+        Get a summary of weather history
+        """
+        stats = self._summarize_recent(30)  # Last 30 days
+        
+        if not stats['count']:
+            return "No weather history available"
+        
+        total_records = stats['count']
+        avg_temp = stats['avg_temp'] if stats['avg_temp'] is not None else 0
+        
+        conditions = stats['conditions']
         most_common_condition = max(conditions, key=conditions.get) if conditions else "Unknown"
         
         summary = f"""
@@ -109,8 +679,13 @@ Total Records: {total_records}
         Clear all weather history (use with caution!)
         """
         try:
-            if os.path.exists(self.history_file):
+            if self.store is not None:
+                self.store.clear()
+            elif os.path.exists(self.history_file):
                 os.remove(self.history_file)
+            self.segments.clear()
+            self._active_month = None
+            self.stats.delete()
             return True
         except Exception as e:
             print(f"Error clearing history: {str(e)}")
@@ -4,15 +4,50 @@ Feature: Weather Journal
 Author: Mindy Stricklin
 """
 
-import json
 import os
+import bisect
+import threading
 from datetime import datetime
 
+from utils.snapshot_log import SnapshotLog
+from utils.search_index import SearchIndex
+from utils.content_store import ContentStore
+
 class WeatherJournal:
-    def __init__(self, data_folder='data'):
+    def __init__(self, data_folder='data', compact_after=500, index_save_every=500,
+                 lock_files=False):
         self.data_folder = data_folder
         self.journal_file = os.path.join(data_folder, 'journal_entries.json')
+        self.log_file = os.path.join(data_folder, 'journal_log.jsonl')
+        self.index_file = os.path.join(data_folder, 'journal_search_index.json')
+        self.weather_file = os.path.join(data_folder, 'journal_weather.jsonl')
+        self.compact_after = compact_after
+        self.index_save_every = index_save_every
         self.ensure_data_folder()
+        
+        # journal_entries.json is the snapshot; changes since it are
+        # appended to journal_log.jsonl and folded in by compaction
+        self.log = SnapshotLog(self.journal_file, self.log_file, lock_files=lock_files)
+        self._compaction_thread = None
+        self._compaction_lock = threading.Lock()
+        
+        # Entries are parsed once and cached with an index by date; the
+        # cache is reloaded only when the files' size or mtime change
+        self._entries = None
+        self._by_date = {}
+        self._dates = []
+        self._fingerprint = None
+        self._cache_lock = threading.RLock()
+        
+        # Word index over notes, mood and weather condition, kept in step
+        # with the cache and saved beside the journal
+        self.search_index = SearchIndex(self.index_file)
+        
+        # Weather snapshots are stored once each and entries keep only a
+        # 'weather_ref' key; they are read back when an entry is handed out.
+        # The fetch timestamp differs on every snapshot, so it stays on the
+        # entry as 'weather_timestamp' and is left out of the stored value
+        self.weather_store = ContentStore(self.weather_file, lock_files=lock_files)
     
     def ensure_data_folder(self):
         """Create data folder if it doesn't exist"""
@@ -24,9 +59,6 @@ class WeatherJournal:
         Add a journal entry with weather and mood data
         """
         try:
-            # Load existing entries
-            entries = self.load_entries()
-            
             # Create new entry
             entry = {
                 'date': date,
@@ -36,75 +68,276 @@ class WeatherJournal:
                 'weather_data': weather_data
             }
             
-            # Add to entries
-            entries.append(entry)
-            
-            # Save back to file
-            return self.save_entries(entries)
+            # Append to the log instead of rewriting every entry
+            with self._cache_lock:
+                self._load_cache()
+                self._log_change({'op': 'add', 'entry': self._store_weather(entry)})
+            self._maybe_compact()
+            return True
             
         except Exception as e:
             print(f"Error adding journal entry: {str(e)}")
             return False
     
     def load_entries(self):
-        """Load all journal entries from file"""
-        try:
-            if os.path.exists(self.journal_file):
-                with open(self.journal_file, 'r') as f:
-                    return json.load(f)
-            else:
-                return []
-        except Exception as e:
-            print(f"Error loading journal entries: {str(e)}")
-            return []
+        """Load all journal entries: the snapshot plus the replayed log"""
+        with self._cache_lock:
+            return [self._export(entry) for entry in self._load_cache()]
+    
+    def iter_entries(self):
+        """Yield a copy of each journal entry in order"""
+        with self._cache_lock:
+            entries = list(self._load_cache())
+        for entry in entries:
+            yield self._export(entry)
     
     def save_entries(self, entries):
-        """Save journal entries to file"""
+        """Save journal entries to file, replacing the snapshot and log"""
         try:
-            with open(self.journal_file, 'w') as f:
-                json.dump(entries, f, indent=2)
+            with self._cache_lock:
+                self.log.write_snapshot([self._store_weather(entry) for entry in entries])
+                self._entries = None
             return True
         except Exception as e:
             print(f"Error saving journal entries: {str(e)}")
             return False
     
+    def _store_weather(self, entry):
+        """Move an entry's weather_data into the weather store, keeping its key"""
+        weather_data = entry.get('weather_data')
+        if not isinstance(weather_data, dict):
+            return entry
+        
+        weather_data = dict(weather_data)
+        stored = {key: value for key, value in entry.items() if key != 'weather_data'}
+        if 'timestamp' in weather_data:
+            stored['weather_timestamp'] = weather_data.pop('timestamp')
+        stored['weather_ref'] = self.weather_store.put(weather_data)
+        return stored
+    
+    def _weather_data(self, entry):
+        """Get an entry's weather data, loading it from the weather store if needed"""
+        if 'weather_ref' in entry:
+            return self.weather_store.get(entry['weather_ref'])
+        return entry.get('weather_data')
+    
+    def _export(self, entry):
+        """Copy a cached entry for callers, with its weather_data filled in"""
+        entry = dict(entry)
+        if 'weather_ref' in entry:
+            weather_data = self.weather_store.get(entry.pop('weather_ref'))
+            timestamp = entry.pop('weather_timestamp', None)
+            if weather_data is not None:
+                weather_data = dict(weather_data)
+                if timestamp is not None:
+                    weather_data['timestamp'] = timestamp
+            entry['weather_data'] = weather_data
+        elif isinstance(entry.get('weather_data'), dict):
+            # Entries not yet moved to the weather store embed the cached dict
+            entry['weather_data'] = dict(entry['weather_data'])
+        return entry
+    
+    def _replay(self, entries, records):
+        """Apply logged add/update/delete records to a list of entries"""
+        for record in records:
+            op = record.get('op')
+            
+            if op == 'add':
+                entries.append(record['entry'])
+            
+            elif op == 'update':
+                for entry in entries:
+                    if entry['date'] == record['date']:
+                        entry.update(record['fields'])
+                        break
+            
+            elif op == 'delete':
+                entries = [entry for entry in entries if entry['date'] != record['date']]
+        
+        return entries
+    
+    def _files_fingerprint(self):
+        """Get the (size, mtime) of each journal file, None if missing"""
+        fingerprint = []
+        for path in (self.journal_file, self.log.compacting_file, self.log_file):
+            try:
+                stat = os.stat(path)
+                fingerprint.append([stat.st_size, stat.st_mtime_ns])
+            except FileNotFoundError:
+                fingerprint.append(None)
+        return fingerprint
+    
+    def _load_cache(self):
+        """Get the cached entries, reloading them if the files changed"""
+        with self._cache_lock:
+            # Fingerprint before reading, so a change made during the
+            # read is picked up on the next call
+            fingerprint = self._files_fingerprint()
+            if self._entries is not None and fingerprint == self._fingerprint:
+                return self._entries
+            
+            try:
+                entries, records = self.log.read(default=[])
+                self._build_index(self._replay(entries, records))
+                self._fingerprint = fingerprint
+            except Exception as e:
+                print(f"Error loading journal entries: {str(e)}")
+                self._build_index([])
+                self._fingerprint = None
+            
+            self._load_search_index()
+            return self._entries
+    
+    def _build_index(self, entries):
+        """Cache entries with a date -> entries dict and a sorted date list"""
+        self._entries = entries
+        self._by_date = {}
+        for entry in entries:
+            self._by_date.setdefault(entry['date'], []).append(entry)
+        self._dates = sorted(self._by_date)
+    
+    def _load_search_index(self):
+        """Load the saved search index, rebuilding it if it is stale (lock must be held)"""
+        if (self._fingerprint is not None and self.search_index.load()
+                and self.search_index.fingerprint == self._fingerprint):
+            return
+        
+        self.search_index.rebuild(
+            ((self._doc_key(date, position), self._entry_text(entry))
+             for date, entries in self._by_date.items()
+             for position, entry in enumerate(entries)),
+            self._fingerprint
+        )
+        if self._fingerprint is not None:
+            self.search_index.save()
+    
+    @staticmethod
+    def _doc_key(date, position):
+        """Name the Nth entry for a date in the search index"""
+        return f"{date}#{position}"
+    
+    def _entry_text(self, entry):
+        """Get the searchable text of an entry: notes, mood and weather condition"""
+        parts = [entry.get('notes') or '', entry.get('mood') or '']
+        weather_data = self._weather_data(entry)
+        if isinstance(weather_data, dict):
+            parts.append(str(weather_data.get('condition') or ''))
+            parts.append(str(weather_data.get('description') or ''))
+        return ' '.join(parts)
+    
+    def _log_change(self, record):
+        """Append a record to the log and apply it to the cache (lock must be held)"""
+        self.log.append(record)
+        op = record['op']
+        
+        if op == 'add':
+            entry = record['entry']
+            if entry['date'] not in self._by_date:
+                bisect.insort(self._dates, entry['date'])
+                self._by_date[entry['date']] = []
+            self._by_date[entry['date']].append(entry)
+            self._entries.append(entry)
+            position = len(self._by_date[entry['date']]) - 1
+            self.search_index.add(self._doc_key(entry['date'], position), self._entry_text(entry))
+        
+        elif op == 'update':
+            entry = self._by_date[record['date']][0]
+            entry.update(record['fields'])
+            self.search_index.add(self._doc_key(record['date'], 0), self._entry_text(entry))
+        
+        elif op == 'delete':
+            removed = self._by_date.pop(record['date'])
+            del self._dates[bisect.bisect_left(self._dates, record['date'])]
+            self._entries = [entry for entry in self._entries if entry['date'] != record['date']]
+            for position in range(len(removed)):
+                self.search_index.remove(self._doc_key(record['date'], position))
+        
+        # Our own change is already in the cache, so it stays current
+        if self._fingerprint is not None:
+            self._fingerprint = self._files_fingerprint()
+            self.search_index.mark_current(self._fingerprint)
+            if self.search_index.unsaved_changes >= self.index_save_every:
+                self.search_index.save()
+    
+    def compact(self):
+        """Fold the log into journal_entries.json"""
+        try:
+            with self._cache_lock:
+                cache_current = (self._entries is not None
+                                 and self._files_fingerprint() == self._fingerprint)
+            
+            self.log.compact(self._replay, default=[])
+            
+            # Compaction rewrites the files without changing the entries,
+            # so a current cache and search index stay current
+            with self._cache_lock:
+                if cache_current and self._fingerprint is not None:
+                    self._fingerprint = self._files_fingerprint()
+                    self.search_index.mark_current(self._fingerprint)
+                    self.search_index.save()
+            return True
+        except Exception as e:
+            print(f"Error compacting journal: {str(e)}")
+            return False
+    
+    def _maybe_compact(self):
+        """Start a background compaction once the log has grown long enough"""
+        if self.log.log_records < self.compact_after:
+            return
+        
+        with self._compaction_lock:
+            if self._compaction_thread is not None and self._compaction_thread.is_alive():
+                return
+            self._compaction_thread = threading.Thread(target=self.compact, daemon=True)
+            self._compaction_thread.start()
+    
+    def wait_for_compaction(self):
+        """Block until a running background compaction has finished"""
+        thread = self._compaction_thread
+        if thread is not None:
+            thread.join()
+    
     def get_recent_entries(self, days=7):
         """Get journal entries from the last N days"""
-        entries = self.load_entries()
-        
-        if not entries:
-            return []
+        recent = []
+        if days <= 0:
+            return recent
         
-        # Sort by date and get recent entries
-        sorted_entries = sorted(entries, key=lambda x: x['date'], reverse=True)
-        return sorted_entries[:days]
+        # Walk the sorted dates from the newest; no sort needed
+        with self._cache_lock:
+            self._load_cache()
+            for date in reversed(self._dates):
+                for entry in self._by_date[date]:
+                    recent.append(self._export(entry))
+                    if len(recent) == days:
+                        return recent
+        return recent
     
     def get_entry_by_date(self, date):
         """Get journal entry for a specific date"""
-        entries = self.load_entries()
-        
-        for entry in entries:
-            if entry['date'] == date:
-                return entry
-        
-        return None
+        with self._cache_lock:
+            self._load_cache()
+            entries = self._by_date.get(date)
+            return self._export(entries[0]) if entries else None
     
     def update_entry(self, date, mood=None, notes=None):
         """Update an existing journal entry"""
         try:
-            entries = self.load_entries()
-            
-            for entry in entries:
-                if entry['date'] == date:
-                    if mood is not None:
-                        entry['mood'] = mood
-                    if notes is not None:
-                        entry['notes'] = notes
-                    entry['last_updated'] = datetime.now().isoformat()
-                    
-                    return self.save_entries(entries)
-            
-            return False  # Entry not found
+            with self._cache_lock:
+                self._load_cache()
+                if date not in self._by_date:
+                    return False  # Entry not found
+                
+                fields = {}
+                if mood is not None:
+                    fields['mood'] = mood
+                if notes is not None:
+                    fields['notes'] = notes
+                fields['last_updated'] = datetime.now().isoformat()
+                
+                self._log_change({'op': 'update', 'date': date, 'fields': fields})
+            self._maybe_compact()
+            return True
             
         except Exception as e:
             print(f"Error updating journal entry: {str(e)}")
@@ -113,15 +346,15 @@ class WeatherJournal:
     def delete_entry(self, date):
         """Delete a journal entry by date"""
         try:
-            entries = self.load_entries()
-            
-            # Filter out the entry to delete
-            updated_entries = [entry for entry in entries if entry['date'] != date]
-            
-            if len(updated_entries) < len(entries):
-                return self.save_entries(updated_entries)
-            else:
-                return False  # Entry not found
+            with self._cache_lock:
+                self._load_cache()
+                if date not in self._by_date:
+                    return False  # Entry not found
+                
+                # Removes every entry for the date
+                self._log_change({'op': 'delete', 'date': date})
+            self._maybe_compact()
+            return True
                 
         except Exception as e:
             print(f"Error deleting journal entry: {str(e)}")
@@ -129,16 +362,17 @@ class WeatherJournal:
     
     def get_mood_summary(self):
         """Get a summary of mood patterns"""
-        entries = self.load_entries()
-        
-        if not entries:
-            return "No journal entries available"
-        
-        # Count moods
-        mood_counts = {}
-        for entry in entries:
-            mood = entry.get('mood', 'Unknown')
-            mood_counts[mood] = mood_counts.get(mood, 0) + 1
+        with self._cache_lock:
+            entries = self._load_cache()
+            
+            if not entries:
+                return "No journal entries available"
+            
+            # Count moods
+            mood_counts = {}
+            for entry in entries:
+                mood = entry.get('mood', 'Unknown')
+                mood_counts[mood] = mood_counts.get(mood, 0) + 1
         
         # Find most common mood
         most_common_mood = max(mood_counts, key=mood_counts.get) if mood_counts else "Unknown"
@@ -158,19 +392,39 @@ Mood Distribution:
         
         return summary.strip()
     
-    def search_entries(self, keyword):
-        """Search journal entries for a keyword"""
-        entries = self.load_entries()
+    def search_entries(self, keyword, mode='index', prefix=True):
+        """
+        Search journal entries for a keyword.
+        mode='index' finds entries containing every word of the keyword
+        (or a word starting with it when prefix is True), best matches
+        first. mode='substring' scans notes and mood for the keyword.
+        """
+        if mode == 'index':
+            return self._search_index(keyword, prefix)
+        if mode != 'substring':
+            raise ValueError(f"Unknown search mode: {mode}")
+        
         matching_entries = []
         
         keyword_lower = keyword.lower()
         
-        for entry in entries:
-            # Search in notes
-            if keyword_lower in entry.get('notes', '').lower():
-                matching_entries.append(entry)
-            # Search in mood
-            elif keyword_lower in entry.get('mood', '').lower():
-                matching_entries.append(entry)
+        with self._cache_lock:
+            for entry in self._load_cache():
+                # Search in notes
+                if keyword_lower in entry.get('notes', '').lower():
+                    matching_entries.append(self._export(entry))
+                # Search in mood
+                elif keyword_lower in entry.get('mood', '').lower():
+                    matching_entries.append(self._export(entry))
         
         return matching_entries
+    
+    def _search_index(self, keyword, prefix):
+        """Answer a search from the word index"""
+        with self._cache_lock:
+            self._load_cache()
+            matching_entries = []
+            for doc_key, score in self.search_index.search(keyword, prefix):
+                date, position = doc_key.rsplit('#', 1)
+                matching_entries.append(self._export(self._by_date[date][int(position)]))
+            return matching_entries
@@ -0,0 +1,242 @@
+"""
+Feature: Background Polling
+- Keeps a watch list of cities fresh, recording history and checking alerts
+Author: Mindy Stricklin
+"""
+
+import time
+import heapq
+import random
+import threading
+
+class WeatherScheduler:
+    """
+    Polls a watch list of cities on one background thread. Cities wait
+    in a heap ordered by when they are next due. Each city's interval
+    adapts: it halves when the weather changes or the temperature is
+    near an alert threshold, and grows by half when nothing changes.
+    
+    Polls are spaced evenly so the scheduler uses at most max_share of
+    the API quota, and a poll waits while the rate limiter has no token
+    free, so interactive requests are never queued behind background
+    ones.
+    """
+    
+    def __init__(self, api, history=None, alerts=None, requests_per_minute=60, max_share=0.5,
+                 min_interval=600, max_interval=3600, initial_interval=900,
+                 temp_change=3.0, pressure_change=2.0, threshold_margin=3.0, on_update=None):
+        self.api = api
+        self.history = history
+        self.alerts = alerts
+        self.rate_limiter = getattr(api, 'rate_limiter', None)
+        self.spacing = 60.0 / (requests_per_minute * max_share)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.initial_interval = initial_interval
+        self.temp_change = temp_change
+        self.pressure_change = pressure_change
+        self.threshold_margin = threshold_margin
+        self.on_update = on_update
+        
+        self._watch = {}  # city -> state
+        self._heap = []  # (due time, sequence, city)
+        self._sequence = 0
+        self._next_slot = 0.0
+        self._add_slot = 0.0
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+        
+        # Statistics
+        self.polls = 0
+        self.failures = 0
+    
+    def add_city(self, city, state=''):
+        """
+        Start watching a city; its first poll is spaced after the others.
+        state is written to the history's state column (e.g. 'TX')
+        """
+        with self._condition:
+            if city in self._watch:
+                return False
+            
+            # Stagger new cities so adding many at once is not a burst
+            now = time.monotonic()
+            self._add_slot = max(self._add_slot, now) + self.spacing
+            self._watch[city] = {'interval': self.initial_interval, 'last': None,
+                                 'polls': 0, 'failures': 0, 'state': state}
+            self._schedule(city, self._add_slot - now)
+            return True
+    
+    def remove_city(self, city):
+        """Stop watching a city; its heap entry is skipped when it comes up"""
+        with self._condition:
+            return self._watch.pop(city, None) is not None
+    
+    def get_watch_list(self):
+        """Get each watched city's interval, seconds until due and last reading"""
+        now = time.monotonic()
+        with self._condition:
+            return [
+                {
+                    'city': city,
+                    'state': state['state'],
+                    'interval': state['interval'],
+                    'due_in': max(0.0, state['due'] - now),
+                    'polls': state['polls'],
+                    'failures': state['failures'],
+                    'last': state['last']
+                }
+                for city, state in sorted(self._watch.items(), key=lambda item: item[1]['due'])
+            ]
+    
+    def _schedule(self, city, delay):
+        """Queue a city's next poll delay seconds from now (lock must be held)"""
+        state = self._watch[city]
+        self._sequence += 1
+        state['due'] = time.monotonic() + delay
+        state['sequence'] = self._sequence
+        heapq.heappush(self._heap, (state['due'], self._sequence, city))
+        self._condition.notify()
+    
+    def start(self):
+        """Start the polling thread"""
+        with self._condition:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+    
+    def stop(self, timeout=None):
+        """Stop the polling thread after any poll in progress"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+    
+    def _next_due(self):
+        """
+        Pop the next city whose poll may run now, or return the seconds
+        to wait before checking again (lock must be held)
+        """
+        while self._heap:
+            due, sequence, city = self._heap[0]
+            state = self._watch.get(city)
+            if state is None or state['sequence'] != sequence:
+                heapq.heappop(self._heap)  # Removed or rescheduled
+                continue
+            
+            now = time.monotonic()
+            wait = max(due - now, self._next_slot - now)
+            if wait <= 0 and self.rate_limiter is not None:
+                wait = self.rate_limiter.estimate_wait()
+            if wait > 0:
+                return None, wait
+            
+            heapq.heappop(self._heap)
+            self._next_slot = now + self.spacing
+            return city, 0
+        return None, None
+    
+    def _run(self):
+        """Poll cities as they come due until stopped"""
+        while True:
+            with self._condition:
+                if self._stopped:
+                    return
+                city, wait = self._next_due()
+                if city is None:
+                    self._condition.wait(wait)
+                    continue
+            
+            # One bad poll or callback must not end the polling thread
+            try:
+                self.poll_city(city)
+            except Exception as e:
+                print(f"Error in background poll for {city}: {str(e)}")
+                self._reschedule_after_error(city)
+    
+    def _reschedule_after_error(self, city):
+        """Queue a city again if a failed poll left it out of the heap"""
+        with self._condition:
+            state = self._watch.get(city)
+            if state is not None and state['due'] <= time.monotonic():
+                self._schedule(city, state['interval'])
+    
+    def poll_city(self, city):
+        """Fetch one city now, record it, check alerts and reschedule it"""
+        try:
+            parsed = self.api.parse_weather_data(self.api.get_current_weather(city))
+        except Exception as e:
+            print(f"Error polling weather for {city}: {str(e)}")
+            with self._condition:
+                self.failures += 1
+                state = self._watch.get(city)
+                if state is not None:
+                    state['failures'] += 1
+                    state['interval'] = min(self.max_interval, state['interval'] * 2)
+                    self._schedule(city, state['interval'])
+            return None
+        
+        alerts = []
+        if self.alerts is not None:
+            alerts = self.alerts.check_alerts(parsed['temperature'], parsed['condition'])
+        if self.history is not None:
+            # The state column holds the US state, like every other writer
+            with self._condition:
+                state = self._watch.get(city)
+                history_state = state['state'] if state is not None else ''
+            self.history.add_weather_record(parsed['city'], history_state, parsed['temperature'],
+                                            parsed['condition'], parsed['pressure'])
+        
+        with self._condition:
+            self.polls += 1
+            state = self._watch.get(city)
+            if state is not None:
+                state['interval'] = self._next_interval(state, parsed, alerts)
+                state['last'] = parsed
+                state['polls'] += 1
+                # Jitter only upward, so a poll never lands inside the cache TTL
+                self._schedule(city, state['interval'] * random.uniform(1.0, 1.1))
+        
+        if self.on_update is not None:
+            self.on_update(city, parsed, alerts)
+        return parsed
+    
+    def _next_interval(self, state, parsed, alerts):
+        """Shorten the interval when the weather is moving, lengthen it when stable"""
+        if self._is_active(state['last'], parsed, alerts):
+            interval = state['interval'] / 2
+        else:
+            interval = state['interval'] * 1.5
+        return max(self.min_interval, min(self.max_interval, interval))
+    
+    def _is_active(self, last, parsed, alerts):
+        """Check whether conditions changed or an alert is triggered or close"""
+        if alerts:
+            return True
+        
+        if self.alerts is not None:
+            evaluator = self.alerts.evaluator
+            temp = parsed['temperature']
+            if evaluator.enabled and (abs(temp - evaluator.high_value) <= self.threshold_margin
+                                      or abs(temp - evaluator.low_value) <= self.threshold_margin):
+                return True
+        
+        if last is None:
+            return False
+        return (parsed['condition'] != last['condition']
+                or abs(parsed['temperature'] - last['temperature']) >= self.temp_change
+                or abs(parsed['pressure'] - last['pressure']) >= self.pressure_change)
+    
+    def get_stats(self):
+        """Get polling statistics"""
+        with self._condition:
+            return {
+                'watched': len(self._watch),
+                'polls': self.polls,
+                'failures': self.failures,
+                'spacing': self.spacing
+            }
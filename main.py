@@ -8,16 +8,22 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import sys
 import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
 
 # Add the project directory to the Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from config import Config
 from utils.api_client import WeatherAPI
+from utils.response_cache import ResponseCache
+from utils.http_transport import HTTPTransport, set_shared_transport
+from utils.rate_limiter import TokenBucket
 from features.weather_display import WeatherDisplay
 from features.weather_history import WeatherHistory
 from features.weather_alerts import WeatherAlerts
 from features.weather_journal import WeatherJournal
+from features.weather_scheduler import WeatherScheduler
 
 class WeatherDashboard:
     def __init__(self):
@@ -27,10 +33,57 @@ class WeatherDashboard:
         
         # Initialize components
         self.config = Config()
-        self.api = WeatherAPI(self.config.get_api_key())
+        self.transport = HTTPTransport(
+            pool_size=self.config.http_pool_size,
+            connect_timeout=self.config.http_connect_timeout,
+            read_timeout=self.config.http_read_timeout,
+            keep_alive=self.config.http_keep_alive
+        )
+        set_shared_transport(self.transport)
+        self.cache = ResponseCache(
+            max_entries=self.config.cache_max_entries,
+            ttls=self.config.get_cache_ttls(),
+            cache_file=self.config.get_cache_file_path() if self.config.cache_on_disk else None
+        )
+        self.rate_limiter = TokenBucket.per_minute(
+            self.config.requests_per_minute,
+            burst=self.config.rate_limit_burst
+        )
+        self.api = WeatherAPI(self.config.get_api_key(), cache=self.cache,
+                              transport=self.transport, rate_limiter=self.rate_limiter)
+        self.history = WeatherHistory(self.config.data_folder, backend=self.config.history_backend,
+                                      rotation=self.config.history_rotation,
+                                      rotation_size=self.config.history_rotation_size,
+                                      compression=self.config.history_compression)
+        self.alerts = WeatherAlerts(self.config.data_folder, lock_files=self.config.lock_files)
+        
+        # Keeps the watch list fresh in the background within the API quota
+        self.background_updates = queue.Queue()
+        self.scheduler = WeatherScheduler(
+            self.api, history=self.history, alerts=self.alerts,
+            requests_per_minute=self.config.requests_per_minute,
+            max_share=self.config.poll_max_share,
+            min_interval=max(self.config.poll_min_interval, self.config.cache_ttl_current),
+            max_interval=self.config.poll_max_interval,
+            on_update=lambda city, parsed, alerts: self.background_updates.put((city, alerts))
+        )
+        for city, state in self.config.watch_cities:
+            self.scheduler.add_city(city, state)
+        if self.config.watch_cities:
+            self.scheduler.start()
+        
+        # Background workers for API calls; results come back through a queue
+        self.executor = ThreadPoolExecutor(max_workers=self.config.ui_worker_threads)
+        self.results = queue.Queue()
+        self.pending = {}  # request id -> future
+        self.request_counter = 0
+        self.latest_request_id = None
         
         # Create main interface
         self.create_widgets()
+        self.location_var.trace_add('write', self.on_location_changed)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.after(self.config.ui_poll_interval_ms, self.poll_results)
         
     def create_widgets(self):
         # Main frame
@@ -58,8 +111,9 @@ class WeatherDashboard:
         self.weather_text.grid(row=2, column=0, columnspan=3, pady=(20, 0))
         
         # Status bar
+        self.status_message = "Ready"
         self.status_var = tk.StringVar()
-        self.status_var.set("Ready")
+        self.status_var.set(self.status_message)
         status_label = ttk.Label(main_frame, textvariable=self.status_var)
         status_label.grid(row=3, column=0, columnspan=3, sticky=tk.W, pady=(10, 0))
         
@@ -68,24 +122,95 @@ class WeatherDashboard:
         if not location:
             messagebox.showerror("Error", "Please enter a city name")
             return
-            
+        
+        # A new request makes every older one stale
+        self.cancel_stale_requests()
+        
+        self.request_counter += 1
+        request_id = self.request_counter
+        self.latest_request_id = request_id
+        
+        future = self.executor.submit(self.fetch_weather, request_id, location)
+        self.pending[request_id] = future
+        self.update_status("Getting weather data...")
+    
+    def fetch_weather(self, request_id, location):
+        # Runs on a worker thread: never touch Tk widgets here
         try:
-            self.status_var.set("Getting weather data...")
-            self.root.update()
+            summary, parsed = self.api.get_weather_summary(location)
+            self.results.put((request_id, summary, parsed))
+        except Exception as e:
+            self.results.put((request_id, f"Could not retrieve weather data: {str(e)}", None))
+    
+    def poll_results(self):
+        # Runs on the Tk main thread via root.after
+        while True:
+            try:
+                request_id, summary, parsed = self.results.get_nowait()
+            except queue.Empty:
+                break
             
-            # This is where we'll call the API
-            # For now, just display a placeholder
-            weather_info = f"Weather data for {location} will be displayed here.\n"
-            weather_info += "This is a placeholder until API integration is complete."
+            self.pending.pop(request_id, None)
+            if request_id != self.latest_request_id:
+                continue  # Stale result for a city the user moved away from
             
             self.weather_text.delete(1.0, tk.END)
-            self.weather_text.insert(1.0, weather_info)
+            self.weather_text.insert(1.0, summary)
             
-            self.status_var.set("Weather data retrieved successfully")
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Could not retrieve weather data: {str(e)}")
-            self.status_var.set("Error retrieving weather data")
+            if parsed is not None:
+                self.update_status("Weather data retrieved successfully")
+            else:
+                self.update_status("Error retrieving weather data")
+        
+        # Alerts raised by background polls of the watch list
+        while True:
+            try:
+                city, alerts = self.background_updates.get_nowait()
+            except queue.Empty:
+                break
+            if alerts:
+                self.update_status(f"{city}: {alerts[0]}")
+        
+        # Forget requests that were cancelled before they started
+        for request_id in [rid for rid, future in self.pending.items() if future.cancelled()]:
+            del self.pending[request_id]
+        
+        self.update_status()
+        
+        self.root.after(self.config.ui_poll_interval_ms, self.poll_results)
+    
+    def on_location_changed(self, *args):
+        # Typing a new city cancels anything still waiting for the old one
+        if self.pending:
+            self.cancel_stale_requests()
+            self.update_status("Ready")
+    
+    def cancel_stale_requests(self):
+        self.latest_request_id = None
+        for future in self.pending.values():
+            future.cancel()  # Only stops requests that have not started yet
+    
+    def update_status(self, message=None):
+        if message is not None:
+            self.status_message = message
+        
+        in_flight = sum(1 for future in self.pending.values() if future.running())
+        queued = sum(1 for future in self.pending.values()
+                     if not future.running() and not future.done())
+        
+        status = self.status_message
+        if in_flight or queued:
+            status += f" ({in_flight} in flight, {queued} queued)"
+        
+        if self.status_var.get() != status:
+            self.status_var.set(status)
+    
+    def on_close(self):
+        self.cancel_stale_requests()
+        self.scheduler.stop(timeout=1)
+        self.executor.shutdown(wait=False)
+        self.cache.flush()
+        self.root.destroy()
     
     def run(self):
         self.root.mainloop()
@@ -0,0 +1,117 @@
+"""
+Tests for WeatherAPI.get_current_weather_bulk against a local stub server
+Author: Mindy Stricklin
+"""
+
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from utils.api_client import WeatherAPI
+from utils.http_transport import HTTPTransport
+from utils.rate_limiter import TokenBucket
+
+def make_item(city_id):
+    """A current weather item as the API returns it"""
+    return {
+        'id': city_id,
+        'name': f"City{city_id}",
+        'sys': {'country': 'US'},
+        'main': {'temp': 70, 'feels_like': 71, 'humidity': 40, 'pressure': 1012},
+        'weather': [{'main': 'Clear', 'description': 'clear sky'}]
+    }
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Serves 'group' and single-city 'weather' responses"""
+    
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        server = self.server
+        with server.lock:
+            server.requests.append((url.path, params))
+        
+        if url.path.endswith('/group'):
+            if server.fail_group:
+                return self._send(500, {'message': 'group unavailable'})
+            ids = [int(city_id) for city_id in params['id'][0].split(',')]
+            # Items come back in a different order than requested
+            return self._send(200, {'cnt': len(ids), 'list': [make_item(city_id) for city_id in reversed(ids)]})
+        
+        if url.path.endswith('/weather'):
+            city_id = int(params['id'][0])
+            if city_id in server.missing_ids:
+                return self._send(404, {'message': 'city not found'})
+            return self._send(200, make_item(city_id))
+        
+        self._send(404, {'message': 'unknown endpoint'})
+    
+    def _send(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def log_message(self, format, *args):
+        pass
+
+class BulkWeatherTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.server.fail_group = False
+        self.server.missing_ids = set()
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        
+        self.transport = HTTPTransport(pool_size=4)
+        self.api = WeatherAPI('test-key', transport=self.transport,
+                              rate_limiter=TokenBucket(rate=1000, burst=1000))
+        self.api.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/data/2.5"
+    
+    def tearDown(self):
+        self.transport.close()
+        self.server.shutdown()
+        self.server.server_close()
+    
+    def endpoint_requests(self, endpoint):
+        return [params for path, params in self.server.requests if path.endswith(f"/{endpoint}")]
+    
+    def test_chunks_ids_by_group_limit(self):
+        city_ids = list(range(1000, 1045))
+        results = self.api.get_current_weather_bulk(city_ids)
+        
+        chunks = [params['id'][0].split(',') for params in self.endpoint_requests('group')]
+        self.assertEqual([len(chunk) for chunk in chunks], [20, 20, 5])
+        self.assertEqual([int(city_id) for chunk in chunks for city_id in chunk], city_ids)
+        self.assertTrue(all(success for success, parsed in results.values()))
+    
+    def test_results_follow_requested_order(self):
+        city_ids = [1007, 1003, 1011, 1003, 1001]
+        results = self.api.get_current_weather_bulk(city_ids)
+        
+        self.assertEqual(list(results), [1007, 1003, 1011, 1001])
+        for city_id, (success, parsed) in results.items():
+            self.assertTrue(success)
+            self.assertEqual(parsed['city'], f"City{city_id}")
+    
+    def test_falls_back_to_single_requests_when_group_fails(self):
+        self.server.fail_group = True
+        self.server.missing_ids = {1002}
+        results = self.api.get_current_weather_bulk([1001, 1002, 1003])
+        
+        self.assertEqual(len(self.endpoint_requests('group')), 1)
+        self.assertEqual(len(self.endpoint_requests('weather')), 3)
+        self.assertEqual(list(results), [1001, 1002, 1003])
+        self.assertTrue(results[1001][0])
+        self.assertEqual(results[1001][1]['city'], 'City1001')
+        self.assertFalse(results[1002][0])
+        self.assertTrue(results[1003][0])
+
+if __name__ == '__main__':
+    unittest.main()
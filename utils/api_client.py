@@ -4,34 +4,64 @@ Author: Mindy Stricklin
 """
 
 import requests
+import copy
 import json
-import time
 from datetime import datetime, timedelta
 
+from utils.response_cache import ResponseCache
+from utils.http_transport import get_shared_transport
+from utils.rate_limiter import TokenBucket
+from utils.single_flight import SingleFlight
+
 class WeatherAPI:
-    def __init__(self, api_key):
+    # Maximum number of city IDs the 'group' endpoint accepts per call
+    GROUP_LIMIT = 20
+    
+    def __init__(self, api_key, cache=None, transport=None, rate_limiter=None, single_flight=None):
         self.api_key = api_key
         self.base_url = "https://api.openweathermap.org/data/2.5"
-        self.last_request_time = 0
-        self.rate_limit_delay = 1  # seconds between requests
+        self.rate_limiter = rate_limiter if rate_limiter is not None else TokenBucket(rate=1, burst=1)
+        self.cache = cache if cache is not None else ResponseCache()
+        self.transport = transport if transport is not None else get_shared_transport()
+        self.single_flight = single_flight if single_flight is not None else SingleFlight()
     
     def _make_request(self, endpoint, params):
-        """Make a rate-limited request to the API"""
-        # Rate limiting
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
+        """Make a cached, rate-limited request to the API"""
+        cached = self.cache.get(endpoint, params)
+        if cached is not None:
+            return cached
         
-        if time_since_last < self.rate_limit_delay:
-            time.sleep(self.rate_limit_delay - time_since_last)
+        # Identical requests already in flight share one upstream call
+        key = self.cache.make_key(endpoint, params)
+        data = self.single_flight.do(key, self._fetch_and_store, endpoint, params)
+        # Coalesced callers all receive the leader's result; each gets its own copy
+        return copy.deepcopy(data)
+    
+    def _fetch_and_store(self, endpoint, params):
+        """Fetch a response and add it to the cache"""
+        # A leader that finished just before this call may have cached it
+        cached = self.cache.get(endpoint, params)
+        if cached is not None:
+            return cached
         
+        data = self._fetch(endpoint, params)
+        self.cache.put(endpoint, params, data)
+        return data
+    
+    def _fetch(self, endpoint, params):
+        """Make a rate-limited request to the API, bypassing the cache"""
+        self.rate_limiter.acquire()
+        return self._send(endpoint, params)
+    
+    def _send(self, endpoint, params):
+        """Send a request to the API without any rate limiting"""
         try:
             url = f"{self.base_url}/{endpoint}"
-            params['appid'] = self.api_key
+            params = dict(params, appid=self.api_key)
             
-            response = requests.get(url, params=params, timeout=10)
+            response = self.transport.get(url, params=params)
             response.raise_for_status()
             
-            self.last_request_time = time.time()
             return response.json()
             
         except requests.exceptions.RequestException as e:
@@ -67,14 +97,73 @@ class WeatherAPI:
         
         return self._make_request('forecast', params)
     
+    def get_current_weather_bulk(self, city_ids, units='imperial'):
+        """
+        Get current weather for many cities by OpenWeatherMap city ID,
+        packing up to GROUP_LIMIT IDs into each 'group' request. If a
+        group request fails, its cities are fetched one at a time.
+        Returns a dict of city_id -> (success, parsed data or error message)
+        """
+        # Drop duplicates but keep the caller's order
+        unique_ids = list(dict.fromkeys(city_ids))
+        results = {}
+        
+        for start in range(0, len(unique_ids), self.GROUP_LIMIT):
+            chunk = unique_ids[start:start + self.GROUP_LIMIT]
+            params = {
+                'id': ','.join(str(city_id) for city_id in chunk),
+                'units': units
+            }
+            
+            try:
+                data = self._make_request('group', params)
+                items = {str(item['id']): item for item in data.get('list', [])}
+            except Exception:
+                for city_id in chunk:
+                    results[city_id] = self._get_current_weather_by_id(city_id, units)
+                continue
+            
+            for city_id in chunk:
+                item = items.get(str(city_id))
+                if item is None:
+                    results[city_id] = (False, "City not found in group response")
+                    continue
+                
+                try:
+                    results[city_id] = (True, self.parse_weather_data(item))
+                except Exception as e:
+                    results[city_id] = (False, str(e))
+        
+        return results
+    
+    def _get_current_weather_by_id(self, city_id, units='imperial'):
+        """Fetch one city by ID. Returns (success, parsed data or error message)"""
+        try:
+            data = self._make_request('weather', {'id': city_id, 'units': units})
+            return True, self.parse_weather_data(data)
+        except Exception as e:
+            return False, str(e)
+    
     def test_connection(self):
         """Test if API connection is working"""
         try:
-            data = self.get_current_weather('London')
+            data = self._fetch('weather', {'q': 'London', 'units': 'imperial'})
             return True, "API connection successful"
         except Exception as e:
             return False, str(e)
     
+    def get_cache_stats(self):
+        """Get hit/miss counters for the response cache"""
+        return self.cache.get_stats()
+    
+    def get_rate_limit_stats(self):
+        """Get how long callers have waited on the rate limiter"""
+        return self.rate_limiter.get_stats()
+    
+    def get_single_flight_stats(self):
+        """Get how many duplicate in-flight requests were coalesced"""
+        return self.single_flight.get_stats()
+    
     def parse_weather_data(self, data):
         """Parse weather data into a standardized format"""
         try:
@@ -0,0 +1,134 @@
+"""
+Asyncio API Client for OpenWeatherMap
+Author: Mindy Stricklin
+"""
+
+import copy
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.api_client import WeatherAPI
+from utils.response_cache import ResponseCache
+from utils.http_transport import HTTPTransport
+from utils.rate_limiter import TokenBucket
+from utils.single_flight import SingleFlight
+
+class AsyncWeatherAPI:
+    """
+    Asyncio version of WeatherAPI. Requests run on a thread pool over a
+    pooled session so many cities can be in flight at once, while the
+    token bucket is awaited on the event loop and shared by every task.
+    """
+    
+    def __init__(self, api_key, cache=None, transport=None, rate_limiter=None,
+                 single_flight=None, max_workers=32):
+        self.api_key = api_key
+        self.cache = cache if cache is not None else ResponseCache()
+        # A transport created here is ours to close; one passed in is the caller's
+        self._owns_transport = transport is None
+        self.transport = transport if transport is not None else HTTPTransport(pool_size=max_workers)
+        self.rate_limiter = rate_limiter if rate_limiter is not None else TokenBucket(rate=1, burst=1)
+        self.single_flight = single_flight if single_flight is not None else SingleFlight()
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        
+        # Reuse the synchronous client for sending and parsing
+        self._api = WeatherAPI(api_key, cache=self.cache, transport=self.transport,
+                               rate_limiter=self.rate_limiter)
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+    
+    def close(self):
+        """Shut down the worker threads and close the transport if this client created it"""
+        self._executor.shutdown(wait=False)
+        if self._owns_transport:
+            self.transport.close()
+    
+    def _send_and_store(self, endpoint, params):
+        """Send a request and cache the response (runs on a worker thread)"""
+        data = self._api._send(endpoint, params)
+        self.cache.put(endpoint, params, data)
+        return data
+    
+    async def _make_request(self, endpoint, params):
+        """Make a cached, rate-limited request to the API"""
+        cached = self.cache.get(endpoint, params)
+        if cached is not None:
+            return cached
+        
+        # Identical requests already in flight share one upstream call
+        key = self.cache.make_key(endpoint, params)
+        data = await self.single_flight.do_async(key, self._fetch_and_store, endpoint, params)
+        # Coalesced callers all receive the leader's result; each gets its own copy
+        return copy.deepcopy(data)
+    
+    async def _fetch_and_store(self, endpoint, params):
+        """Wait for the rate limiter, then fetch and cache on a worker thread"""
+        # A leader that finished just before this call may have cached it
+        cached = self.cache.get(endpoint, params)
+        if cached is not None:
+            return cached
+        
+        await self.rate_limiter.acquire_async()
+        
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._send_and_store, endpoint, params)
+    
+    async def get_current_weather(self, city, units='imperial'):
+        """Get current weather for a city"""
+        params = {
+            'q': city,
+            'units': units
+        }
+        
+        return await self._make_request('weather', params)
+    
+    async def get_weather_by_coords(self, lat, lon, units='imperial'):
+        """Get weather by coordinates"""
+        params = {
+            'lat': lat,
+            'lon': lon,
+            'units': units
+        }
+        
+        return await self._make_request('weather', params)
+    
+    async def get_forecast(self, city, units='imperial'):
+        """Get 5-day forecast for a city"""
+        params = {
+            'q': city,
+            'units': units
+        }
+        
+        return await self._make_request('forecast', params)
+    
+    def parse_weather_data(self, data):
+        """Parse weather data into a standardized format"""
+        return self._api.parse_weather_data(data)
+    
+    def get_single_flight_stats(self):
+        """Get how many duplicate in-flight requests were coalesced"""
+        return self.single_flight.get_stats()
+    
+    async def gather_current_weather(self, cities, concurrency=10, units='imperial'):
+        """
+        Fetch current weather for many cities concurrently.
+        Returns a dict of city -> (success, parsed data or error message),
+        so one failing city never aborts the rest of the batch.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def fetch_one(city):
+            async with semaphore:
+                try:
+                    data = await self.get_current_weather(city, units)
+                    return city, (True, self.parse_weather_data(data))
+                except Exception as e:
+                    return city, (False, str(e))
+        
+        results = await asyncio.gather(*(fetch_one(city) for city in cities))
+        return dict(results)
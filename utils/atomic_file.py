@@ -0,0 +1,88 @@
+"""
+Atomic file persistence for Weather Dashboard
+Author: Mindy Stricklin
+"""
+
+import os
+import json
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Not available on Windows; locking becomes a no-op
+
+def write_durable(file_path, data, fsync=True):
+    """Write str or bytes to a file and, if fsync, flush it to disk"""
+    mode = 'wb' if isinstance(data, bytes) else 'w'
+    with open(file_path, mode) as f:
+        f.write(data)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+
+def fsync_folder(folder):
+    """Flush a folder's entries to disk so a rename in it survives a crash"""
+    if os.name != 'posix':
+        return
+    fd = os.open(folder or '.', os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def atomic_write(file_path, data, fsync=True, lock=False):
+    """
+    Replace a file with new str or bytes contents in one step. The data
+    goes to a uniquely named temp file in the same folder, is fsynced,
+    and is renamed over the target, so readers and crashes only ever
+    see the old file or the complete new one. fsync=False skips the
+    flushes for files that can be rebuilt, like caches.
+    """
+    folder = os.path.dirname(file_path)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder)
+    
+    with file_lock(file_path, enabled=lock):
+        # Unique per process and thread, so concurrent writers never share one
+        temp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            write_durable(temp_path, data, fsync)
+            os.replace(temp_path, file_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        
+        if fsync:
+            fsync_folder(folder)
+
+def atomic_write_json(file_path, data, indent=None, fsync=True, lock=False):
+    """Replace a file with data encoded as JSON, atomically"""
+    atomic_write(file_path, json.dumps(data, indent=indent), fsync, lock)
+
+def read_json(file_path, lock=False):
+    """Read a JSON file, holding a shared lock while reading if lock is set"""
+    with file_lock(file_path, shared=True, enabled=lock):
+        with open(file_path, 'r') as f:
+            return json.load(f)
+
+@contextmanager
+def file_lock(file_path, shared=False, enabled=True):
+    """
+    Hold an advisory lock on file_path for the duration of a with block,
+    so several processes can share the data folder. The lock is taken on
+    a separate '.lock' file because the data file itself is replaced by
+    every atomic write. Shared locks allow concurrent readers.
+    """
+    if not enabled or fcntl is None:
+        yield
+        return
+    
+    with open(f"{file_path}.lock", 'a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,256 @@
+"""
+Incremental, deduplicated backups for Weather Dashboard
+Author: Mindy Stricklin
+"""
+
+import os
+import gzip
+import shutil
+import hashlib
+import threading
+from datetime import datetime
+
+from utils.atomic_file import atomic_write_json, read_json, fsync_folder, file_lock
+
+class BackupStore:
+    """
+    Content-addressed snapshots of the data folder.
+    
+    Every file's contents are stored once, gzip-compressed, under
+    objects/ and named by their SHA-256. A snapshot is a folder holding
+    a manifest (path -> hash, size, mtime) and a hard link to the object
+    of each file, so unchanged files cost no I/O or space: a file whose
+    size and mtime match the previous snapshot is not even re-read.
+    Changed files are hashed and compressed in one streaming pass.
+    Pruning removes whole snapshots and then only the objects that no
+    remaining manifest references.
+    
+    Folders are created by the first snapshot. Creating and pruning
+    snapshots hold a lock on the backup folder, so pruning can safely
+    delete the incomplete snapshots that interrupted backups leave.
+    """
+    
+    CHUNK_SIZE = 1024 * 1024
+    SKIPPED_SUFFIXES = ('.lock', '.tmp')
+    
+    def __init__(self, data_folder='data', backup_folder=None):
+        self.data_folder = data_folder
+        self.backup_folder = backup_folder or f"{data_folder.rstrip(os.sep)}_backups"
+        self.objects_folder = os.path.join(self.backup_folder, 'objects')
+        self.snapshots_folder = os.path.join(self.backup_folder, 'snapshots')
+        self._lock = threading.Lock()
+    
+    def _backup_lock(self):
+        """Hold the backup folder against other processes (the thread lock must be held)"""
+        if not os.path.exists(self.backup_folder):
+            os.makedirs(self.backup_folder)
+        return file_lock(os.path.join(self.backup_folder, 'backups'))
+    
+    def _object_path(self, digest):
+        """Path of the compressed object for a content hash"""
+        return os.path.join(self.objects_folder, digest[:2], f"{digest}.gz")
+    
+    def _manifest_path(self, name):
+        """Path of a snapshot's manifest"""
+        return os.path.join(self.snapshots_folder, name, 'manifest.json')
+    
+    def list_snapshots(self):
+        """Get the names of complete snapshots, oldest first"""
+        if not os.path.exists(self.snapshots_folder):
+            return []
+        return sorted(name for name in os.listdir(self.snapshots_folder)
+                      if os.path.exists(self._manifest_path(name)))
+    
+    def read_manifest(self, name):
+        """Get a snapshot's manifest"""
+        return read_json(self._manifest_path(name))
+    
+    def _iter_data_files(self, folder):
+        """Yield (relative path, full path) for every file worth backing up"""
+        for root, dirs, files in os.walk(folder):
+            dirs.sort()
+            for filename in sorted(files):
+                if filename.endswith(self.SKIPPED_SUFFIXES):
+                    continue
+                full_path = os.path.join(root, filename)
+                yield os.path.relpath(full_path, folder).replace(os.sep, '/'), full_path
+    
+    def _store_file(self, file_path):
+        """
+        Hash and compress a file in one pass, keeping the compressed copy
+        only if no object with the same contents exists.
+        Returns (hash, whether a new object was stored)
+        """
+        # Unique per process and thread, so concurrent writers never share one
+        temp_path = os.path.join(self.objects_folder,
+                                 f"incoming.{os.getpid()}.{threading.get_ident()}.tmp")
+        digest = hashlib.sha256()
+        try:
+            with open(file_path, 'rb') as source, gzip.open(temp_path, 'wb', compresslevel=6) as target:
+                for chunk in iter(lambda: source.read(self.CHUNK_SIZE), b''):
+                    digest.update(chunk)
+                    target.write(chunk)
+            
+            object_path = self._object_path(digest.hexdigest())
+            if os.path.exists(object_path):
+                os.remove(temp_path)
+                return digest.hexdigest(), False
+            
+            if not os.path.exists(os.path.dirname(object_path)):
+                os.makedirs(os.path.dirname(object_path))
+            os.replace(temp_path, object_path)
+            return digest.hexdigest(), True
+            
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+    
+    def create_snapshot(self):
+        """
+        Snapshot the data folder. Returns (snapshot name, stats) where
+        stats counts files that were stored, reused and unchanged
+        """
+        with self._lock, self._backup_lock():
+            return self._create_snapshot()
+    
+    def _create_snapshot(self):
+        """Snapshot the data folder (both locks must be held)"""
+        for folder in (self.objects_folder, self.snapshots_folder):
+            if not os.path.exists(folder):
+                os.makedirs(folder)
+        
+        snapshots = self.list_snapshots()
+        previous = self.read_manifest(snapshots[-1])['files'] if snapshots else {}
+        stats = {'files': 0, 'stored': 0, 'reused': 0, 'unchanged': 0, 'bytes_read': 0}
+        
+        # Same-second suffixes are zero-padded so names sort in order
+        name = datetime.now().strftime('%Y%m%d_%H%M%S')
+        suffix = 1
+        while os.path.exists(os.path.join(self.snapshots_folder, name)):
+            name = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{suffix:03d}"
+            suffix += 1
+        snapshot_folder = os.path.join(self.snapshots_folder, name)
+        
+        files = {}
+        for relative_path, full_path in self._iter_data_files(self.data_folder):
+            stat = os.stat(full_path)
+            stats['files'] += 1
+            earlier = previous.get(relative_path)
+            
+            if (earlier is not None and earlier['size'] == stat.st_size
+                    and earlier['mtime_ns'] == stat.st_mtime_ns
+                    and os.path.exists(self._object_path(earlier['hash']))):
+                digest = earlier['hash']
+                stats['unchanged'] += 1
+            else:
+                digest, stored = self._store_file(full_path)
+                stats['bytes_read'] += stat.st_size
+                stats['stored' if stored else 'reused'] += 1
+            
+            files[relative_path] = {'hash': digest, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+            self._link_object(digest, os.path.join(snapshot_folder, 'files', f"{relative_path}.gz"))
+        
+        # The manifest is written last; a snapshot without one is incomplete
+        atomic_write_json(self._manifest_path(name), {
+            'created': datetime.now().isoformat(),
+            'data_folder': self.data_folder,
+            'files': files
+        }, indent=2)
+        return name, stats
+    
+    def _link_object(self, digest, link_path):
+        """Hard-link an object into a snapshot folder, or copy where links are unsupported"""
+        folder = os.path.dirname(link_path)
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        try:
+            os.link(self._object_path(digest), link_path)
+        except OSError:
+            shutil.copy2(self._object_path(digest), link_path)
+    
+    def restore_snapshot(self, name, target_folder=None):
+        """
+        Rebuild a snapshot into target_folder (the data folder by
+        default). Files the snapshot does not have are removed, so the
+        folder matches the snapshot exactly. Returns the files restored
+        """
+        with self._lock, self._backup_lock():
+            return self._restore_snapshot(name, target_folder or self.data_folder)
+    
+    def _restore_snapshot(self, name, target_folder):
+        """Rebuild a snapshot into target_folder (both locks must be held)"""
+        files = self.read_manifest(name)['files']
+        
+        for relative_path, info in files.items():
+            target_path = os.path.join(target_folder, *relative_path.split('/'))
+            folder = os.path.dirname(target_path)
+            if not os.path.exists(folder):
+                os.makedirs(folder)
+            
+            temp_path = f"{target_path}.restore.tmp"
+            with gzip.open(self._object_path(info['hash']), 'rb') as source, open(temp_path, 'wb') as target:
+                shutil.copyfileobj(source, target, self.CHUNK_SIZE)
+                target.flush()
+                os.fsync(target.fileno())
+            os.replace(temp_path, target_path)
+            os.utime(target_path, ns=(info['mtime_ns'], info['mtime_ns']))
+        
+        if os.path.exists(target_folder):
+            for relative_path, full_path in list(self._iter_data_files(target_folder)):
+                if relative_path not in files:
+                    os.remove(full_path)
+            fsync_folder(target_folder)
+        return len(files)
+    
+    def prune(self, keep_count=5):
+        """
+        Delete all but the newest keep_count snapshots and any snapshot
+        an interrupted backup left without a manifest, then every object
+        no remaining snapshot references. Returns (snapshots removed,
+        objects removed)
+        """
+        if not os.path.exists(self.snapshots_folder):
+            return 0, 0
+        with self._lock, self._backup_lock():
+            return self._prune(keep_count)
+    
+    def _prune(self, keep_count):
+        """Delete old and incomplete snapshots and unreferenced objects (both locks must be held)"""
+        snapshots = self.list_snapshots()
+        removed = snapshots[:-keep_count] if keep_count > 0 else list(snapshots)
+        # No backup is running while the lock is held, so these were interrupted
+        removed += [name for name in os.listdir(self.snapshots_folder)
+                    if name not in snapshots]
+        for name in removed:
+            shutil.rmtree(os.path.join(self.snapshots_folder, name))
+        
+        referenced = set()
+        for name in self.list_snapshots():
+            referenced.update(info['hash'] for info in self.read_manifest(name)['files'].values())
+        
+        removed_objects = 0
+        for prefix in os.listdir(self.objects_folder):
+            prefix_folder = os.path.join(self.objects_folder, prefix)
+            if not os.path.isdir(prefix_folder):
+                if prefix.endswith('.tmp'):
+                    # Left by a backup that was interrupted mid-file
+                    os.remove(prefix_folder)
+                continue
+            for filename in os.listdir(prefix_folder):
+                if filename[:-len('.gz')] not in referenced:
+                    os.remove(os.path.join(prefix_folder, filename))
+                    removed_objects += 1
+        return len(removed), removed_objects
+    
+    def get_usage(self):
+        """Get the bytes used by objects, counting each stored object once"""
+        if not os.path.exists(self.objects_folder):
+            return {'objects': 0, 'bytes': 0, 'snapshots': 0}
+        total = 0
+        count = 0
+        for root, dirs, files in os.walk(self.objects_folder):
+            for filename in files:
+                total += os.path.getsize(os.path.join(root, filename))
+                count += 1
+        return {'objects': count, 'bytes': total, 'snapshots': len(self.list_snapshots())}
@@ -0,0 +1,404 @@
+"""
+Columnar, memory-mapped storage for weather history
+Author: Mindy Stricklin
+"""
+
+import os
+import json
+import threading
+import contextlib
+from datetime import date
+
+from utils.atomic_file import atomic_write_json
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+EPOCH = date(1970, 1, 1)
+
+class ColumnarHistoryStore:
+    """
+    Stores weather observations as one fixed-width binary file per
+    column. Dates are days since 1970-01-01, temperature and pressure
+    are float32 (NaN when missing), and city, state and condition are
+    dictionary-encoded integer codes. Columns are appended in place and
+    read back through numpy.memmap, so scans never copy the file.
+    """
+    
+    COLUMNS = {
+        'date': '<i4',
+        'temp': '<f4',
+        'pressure': '<f4',
+        'city': '<u4',
+        'state': '<u2',
+        'condition': '<u2'
+    }
+    ENCODED_COLUMNS = ('city', 'state', 'condition')
+    
+    def __init__(self, folder):
+        if np is None:
+            raise ImportError("The columnar history backend requires numpy (pip install numpy)")
+        
+        self.folder = folder
+        self.dictionary_file = os.path.join(folder, 'dictionaries.json')
+        self._lock = threading.Lock()
+        
+        if not os.path.exists(self.folder):
+            os.makedirs(self.folder)
+        
+        self.load_dictionaries()
+    
+    def _column_path(self, name):
+        """Get the file path for a column"""
+        return os.path.join(self.folder, f"{name}.bin")
+    
+    def load_dictionaries(self):
+        """Load the value lists used to decode city, state and condition"""
+        if os.path.exists(self.dictionary_file):
+            with open(self.dictionary_file, 'r') as f:
+                self.dictionaries = json.load(f)
+        else:
+            self.dictionaries = {name: [] for name in self.ENCODED_COLUMNS}
+        
+        self._codes = {
+            name: {value: code for code, value in enumerate(values)}
+            for name, values in self.dictionaries.items()
+        }
+    
+    def _save_dictionaries(self):
+        """Write the dictionaries, replacing the old file in one step"""
+        atomic_write_json(self.dictionary_file, self.dictionaries)
+    
+    def _encode(self, name, value):
+        """Get the code for a value, adding it to the dictionary if new"""
+        codes = self._codes[name]
+        code = codes.get(value)
+        if code is None:
+            code = len(self.dictionaries[name])
+            if code > np.iinfo(self.COLUMNS[name]).max:
+                raise ValueError(f"Too many distinct values for column '{name}'")
+            self.dictionaries[name].append(value)
+            codes[value] = code
+        return code
+    
+    @staticmethod
+    def _to_float(value):
+        """Convert a temperature or pressure to float, NaN if missing"""
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return float('nan')
+    
+    @staticmethod
+    def _to_day(date_str):
+        """Convert a YYYY-MM-DD string to days since the epoch"""
+        return (date.fromisoformat(date_str) - EPOCH).days
+    
+    def append(self, date_str, city, state, temp, condition, pressure=None):
+        """Append a single observation"""
+        return self.append_many([(date_str, city, state, temp, condition, pressure)])
+    
+    def append_many(self, records):
+        """
+        Append observations given as (date, city, state, temp, condition,
+        pressure) tuples. Each column is written with one call.
+        """
+        records = list(records)
+        if not records:
+            return 0
+        
+        with self._lock:
+            self._truncate_torn_rows()
+            columns = {name: [] for name in self.COLUMNS}
+            dictionary_size = sum(len(values) for values in self.dictionaries.values())
+            
+            for date_str, city, state, temp, condition, pressure in records:
+                columns['date'].append(self._to_day(date_str))
+                columns['temp'].append(self._to_float(temp))
+                columns['pressure'].append(self._to_float(pressure))
+                columns['city'].append(self._encode('city', city))
+                columns['state'].append(self._encode('state', state))
+                columns['condition'].append(self._encode('condition', condition))
+            
+            # Save new dictionary values first so every code on disk decodes
+            if sum(len(values) for values in self.dictionaries.values()) != dictionary_size:
+                self._save_dictionaries()
+            
+            for name, dtype in self.COLUMNS.items():
+                with open(self._column_path(name), 'ab') as f:
+                    f.write(np.asarray(columns[name], dtype=dtype).tobytes())
+        
+        return len(records)
+    
+    def _truncate_torn_rows(self):
+        """
+        Cut every column back to the rows complete in all columns, so an
+        append after a crash between column writes starts each column at
+        the same row (lock must be held)
+        """
+        length = len(self)
+        for name, dtype in self.COLUMNS.items():
+            path = self._column_path(name)
+            complete_size = length * np.dtype(dtype).itemsize
+            if os.path.exists(path) and os.path.getsize(path) > complete_size:
+                with open(path, 'rb+') as f:
+                    f.truncate(complete_size)
+    
+    def __len__(self):
+        # A crash between column writes can leave columns of different
+        # lengths; only rows present in every column count
+        counts = []
+        for name, dtype in self.COLUMNS.items():
+            path = self._column_path(name)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            counts.append(size // np.dtype(dtype).itemsize)
+        return min(counts)
+    
+    def columns(self):
+        """Get every column as a read-only memory-mapped array"""
+        length = len(self)
+        arrays = {}
+        for name, dtype in self.COLUMNS.items():
+            if length == 0:
+                arrays[name] = np.empty(0, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(self._column_path(name), dtype=dtype,
+                                         mode='r', shape=(length,))
+        return arrays
+    
+    def decode(self, name, codes):
+        """Turn an array of codes back into their string values"""
+        values = np.asarray(self.dictionaries[name], dtype=object)
+        return values[np.asarray(codes)]
+    
+    def select(self, start_date=None, end_date=None, city=None):
+        """
+        Get a boolean mask of rows within an inclusive date range and,
+        optionally, for one city
+        """
+        arrays = self.columns()
+        mask = np.ones(len(arrays['date']), dtype=bool)
+        
+        if start_date is not None:
+            mask &= arrays['date'] >= self._to_day(start_date)
+        if end_date is not None:
+            mask &= arrays['date'] <= self._to_day(end_date)
+        if city is not None:
+            code = self._codes['city'].get(city)
+            if code is None:
+                mask[:] = False
+            else:
+                mask &= arrays['city'] == code
+        
+        return mask
+    
+    def summarize(self, start_date=None, end_date=None, city=None):
+        """Get temperature, pressure and condition aggregates for a range"""
+        return self._aggregate(self.columns(), self.select(start_date, end_date, city))
+    
+    def summarize_recent(self, count):
+        """Get aggregates over the last N records"""
+        length = len(self)
+        return self._aggregate(self.columns(), slice(max(0, length - count), length))
+    
+    def _aggregate(self, arrays, rows):
+        """Compute aggregates over the rows picked by a mask or slice"""
+        temps = arrays['temp'][rows]
+        pressures = arrays['pressure'][rows]
+        conditions = arrays['condition'][rows]
+        valid_temps = temps[~np.isnan(temps)]
+        valid_pressures = pressures[~np.isnan(pressures)]
+        
+        # Most frequent first; ties go to the condition seen first
+        codes, first_seen, counts = np.unique(conditions, return_index=True, return_counts=True)
+        order = np.lexsort((first_seen, -counts))
+        
+        return {
+            'count': len(temps),
+            'avg_temp': float(valid_temps.mean()) if len(valid_temps) else None,
+            'min_temp': float(valid_temps.min()) if len(valid_temps) else None,
+            'max_temp': float(valid_temps.max()) if len(valid_temps) else None,
+            'avg_pressure': float(valid_pressures.mean()) if len(valid_pressures) else None,
+            'conditions': {
+                self.dictionaries['condition'][codes[i]]: int(counts[i]) for i in order
+            }
+        }
+    
+    def get_range(self, city, start_date, end_date):
+        """Get one city's records within an inclusive date range"""
+        arrays = self.columns()
+        rows = np.nonzero(self.select(start_date, end_date, city))[0]
+        # Stable sort keeps insertion order within a day
+        rows = rows[np.argsort(arrays['date'][rows], kind='stable')]
+        return self.to_records(rows)
+    
+    def city_stats(self):
+        """Get per-city counts, temperature stats and date span"""
+        arrays = self.columns()
+        if len(arrays['date']) == 0:
+            return []
+        
+        state_count = max(len(self.dictionaries['state']), 1)
+        keys = arrays['city'].astype(np.int64) * state_count + arrays['state']
+        groups, inverse = np.unique(keys, return_inverse=True)
+        group_count = len(groups)
+        
+        temps = arrays['temp']
+        pressures = arrays['pressure']
+        has_temp = ~np.isnan(temps)
+        has_pressure = ~np.isnan(pressures)
+        
+        counts = np.bincount(inverse, minlength=group_count)
+        temp_counts = np.bincount(inverse[has_temp], minlength=group_count)
+        temp_sums = np.bincount(inverse[has_temp], weights=temps[has_temp], minlength=group_count)
+        pressure_counts = np.bincount(inverse[has_pressure], minlength=group_count)
+        pressure_sums = np.bincount(inverse[has_pressure], weights=pressures[has_pressure],
+                                    minlength=group_count)
+        
+        min_temps = np.full(group_count, np.inf)
+        max_temps = np.full(group_count, -np.inf)
+        np.minimum.at(min_temps, inverse[has_temp], temps[has_temp])
+        np.maximum.at(max_temps, inverse[has_temp], temps[has_temp])
+        
+        first_days = np.full(group_count, np.iinfo(np.int32).max)
+        last_days = np.full(group_count, np.iinfo(np.int32).min)
+        np.minimum.at(first_days, inverse, arrays['date'])
+        np.maximum.at(last_days, inverse, arrays['date'])
+        
+        stats = []
+        for group in range(group_count):
+            city_code, state_code = divmod(int(groups[group]), state_count)
+            has_temps = temp_counts[group] > 0
+            stats.append({
+                'city': self.dictionaries['city'][city_code],
+                'state': self.dictionaries['state'][state_code],
+                'count': int(counts[group]),
+                'avg_temp': float(temp_sums[group] / temp_counts[group]) if has_temps else None,
+                'min_temp': float(min_temps[group]) if has_temps else None,
+                'max_temp': float(max_temps[group]) if has_temps else None,
+                'avg_pressure': float(pressure_sums[group] / pressure_counts[group])
+                                if pressure_counts[group] else None,
+                'first_date': self._to_date(first_days[group]),
+                'last_date': self._to_date(last_days[group])
+            })
+        
+        return sorted(stats, key=lambda item: (item['city'], item['state']))
+    
+    def city_conditions(self):
+        """
+        Get each city's condition counts in one pass over a combined
+        (city, state, condition) key.
+        Returns {(city, state): {condition: count}}, most frequent first
+        """
+        arrays = self.columns()
+        if len(arrays['date']) == 0:
+            return {}
+        
+        state_count = max(len(self.dictionaries['state']), 1)
+        condition_count = max(len(self.dictionaries['condition']), 1)
+        keys = ((arrays['city'].astype(np.int64) * state_count + arrays['state'])
+                * condition_count + arrays['condition'])
+        groups, first_seen, counts = np.unique(keys, return_index=True, return_counts=True)
+        city_states, condition_codes = np.divmod(groups, condition_count)
+        
+        # Within each city, most frequent first; ties go to the condition seen first
+        conditions = {}
+        for i in np.lexsort((first_seen, -counts, city_states)):
+            city_code, state_code = divmod(int(city_states[i]), state_count)
+            key = (self.dictionaries['city'][city_code], self.dictionaries['state'][state_code])
+            condition = self.dictionaries['condition'][int(condition_codes[i])]
+            conditions.setdefault(key, {})[condition] = int(counts[i])
+        return conditions
+    
+    def _format_number(self, value):
+        """
+        Format a stored float the way the text history writes it, with
+        every digit needed to read back the same float32
+        """
+        if np.isnan(value):
+            return 'N/A'
+        # The shortest digits that read back as the same float32; repr()
+        # of the widened float would show float32 noise (1013.2000122...)
+        return np.format_float_positional(np.float32(value), trim='-')
+    
+    @staticmethod
+    def _to_date(day):
+        """Convert days since the epoch back to a YYYY-MM-DD string"""
+        return date.fromordinal(EPOCH.toordinal() + int(day)).isoformat()
+    
+    def to_records(self, rows):
+        """Convert row indices into history record dicts"""
+        arrays = self.columns()
+        records = []
+        for row in rows:
+            records.append({
+                'date': self._to_date(arrays['date'][row]),
+                'city': self.dictionaries['city'][arrays['city'][row]],
+                'state': self.dictionaries['state'][arrays['state'][row]],
+                'temp': self._format_number(arrays['temp'][row]),
+                'condition': self.dictionaries['condition'][arrays['condition'][row]],
+                'pressure': self._format_number(arrays['pressure'][row])
+            })
+        return records
+    
+    def iter_records(self, batch_size=10000):
+        """Yield every record in insertion order"""
+        length = len(self)
+        for start in range(0, length, batch_size):
+            for record in self.to_records(range(start, min(start + batch_size, length))):
+                yield record
+    
+    def tail(self, count):
+        """Get the last N records in insertion order"""
+        length = len(self)
+        return self.to_records(range(max(0, length - count), length))
+    
+    def clear(self):
+        """Remove every column and dictionary file"""
+        with self._lock:
+            for name in self.COLUMNS:
+                path = self._column_path(name)
+                if os.path.exists(path):
+                    os.remove(path)
+            if os.path.exists(self.dictionary_file):
+                os.remove(self.dictionary_file)
+            self.load_dictionaries()
+
+
+def convert_text_history(text_path, folder, batch_size=100000):
+    """
+    One-shot conversion of a text history file into a columnar store.
+    Reads the text file as a stream and appends in batches. text_path
+    may also be an iterable of lines, such as a segmented history.
+    Raises ValueError if the store already holds records, so converting
+    twice cannot duplicate them. Returns the number of records converted.
+    """
+    store = ColumnarHistoryStore(folder)
+    if len(store):
+        raise ValueError("The columnar history already holds records; clear it before converting")
+    converted = 0
+    batch = []
+    
+    lines = open(text_path, 'r') if isinstance(text_path, str) else contextlib.nullcontext(text_path)
+    with lines as f:
+        for line in f:
+            parts = line.strip().split(',')
+            if len(parts) < 5:
+                continue
+            
+            try:
+                ColumnarHistoryStore._to_day(parts[0])
+            except ValueError:
+                continue  # Skip rows with an unreadable date
+            
+            pressure = parts[5] if len(parts) > 5 else None
+            batch.append((parts[0], parts[1], parts[2], parts[3], parts[4], pressure))
+            
+            if len(batch) >= batch_size:
+                converted += store.append_many(batch)
+                batch = []
+    
+    converted += store.append_many(batch)
+    return converted
@@ -0,0 +1,126 @@
+"""
+Content-addressed storage for Weather Dashboard
+Author: Mindy Stricklin
+"""
+
+import os
+import json
+import hashlib
+import threading
+
+from utils.atomic_file import file_lock
+
+KEY_PREFIX = b'{"key": "'
+
+class ContentStore:
+    """
+    Stores JSON values once each under a key derived from their content,
+    in an append-only JSON Lines file. Storing an equal value again
+    returns the existing key without writing anything.
+    
+    Opening the store only scans the file for each key's offset; a value
+    is parsed the first time it is requested and then kept in memory.
+    
+    With lock_files, appends and the repair of a torn last line hold an
+    advisory file lock, so several processes can share the file without
+    one cutting off a line another is still writing.
+    """
+    
+    KEY_LENGTH = 32
+    
+    def __init__(self, store_file, lock_files=False):
+        self.store_file = store_file
+        self.lock_files = lock_files
+        self._offsets = None
+        self._scanned_size = 0
+        self._values = {}
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def make_key(cls, value):
+        """Hash a value's canonical JSON form into its key"""
+        canonical = json.dumps(value, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:cls.KEY_LENGTH]
+    
+    def _file_lock(self, shared=False):
+        """Lock the file against other processes, if lock_files is set"""
+        return file_lock(self.store_file, shared=shared, enabled=self.lock_files)
+    
+    def _load_offsets(self):
+        """Scan the file once for key offsets (both locks must be held)"""
+        if self._offsets is None:
+            self._offsets = {}
+            self._scan(repair=True)
+    
+    def _scan(self, repair=False):
+        """
+        Record where each key's line starts, without parsing the values,
+        from where the last scan stopped. With repair, a torn last line
+        left by a crash is cut off (both locks must be held, the file
+        lock exclusively for repair)
+        """
+        if not os.path.exists(self.store_file):
+            return
+        
+        with open(self.store_file, 'rb+') as f:
+            offset = self._scanned_size
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # Nothing refers to a torn line yet, since values are
+                    # stored before the records that use them
+                    if repair:
+                        f.truncate(offset)
+                    break
+                if line.startswith(KEY_PREFIX):
+                    key = line[len(KEY_PREFIX):len(KEY_PREFIX) + self.KEY_LENGTH].decode('ascii')
+                    self._offsets.setdefault(key, offset)
+                offset += len(line)
+            self._scanned_size = offset
+    
+    def put(self, value):
+        """Store a value if it is new and return its key"""
+        key = self.make_key(value)
+        with self._lock, self._file_lock():
+            self._load_offsets()
+            if key not in self._offsets:
+                # Another process may have stored it since the last scan;
+                # with the file locked, a torn line can only be a crash's
+                self._scan(repair=True)
+            if key in self._offsets:
+                return key
+            
+            line = (json.dumps({'key': key, 'value': value}) + '\n').encode('utf-8')
+            with open(self.store_file, 'ab') as f:
+                offset = f.tell()
+                f.write(line)
+            self._offsets[key] = offset
+            if offset == self._scanned_size:
+                self._scanned_size = offset + len(line)
+            return key
+    
+    def get(self, key):
+        """Get the value stored under a key, or None if there is none"""
+        with self._lock:
+            if key in self._values:
+                return self._values[key]
+            
+            with self._file_lock(shared=self._offsets is not None):
+                self._load_offsets()
+                if key not in self._offsets:
+                    # Another process may have added it since the last scan
+                    self._scan()
+                offset = self._offsets.get(key)
+                if offset is None:
+                    return None
+                
+                with open(self.store_file, 'rb') as f:
+                    f.seek(offset)
+                    value = json.loads(f.readline())['value']
+            self._values[key] = value
+            return value
+    
+    def __len__(self):
+        with self._lock, self._file_lock():
+            self._load_offsets()
+            return len(self._offsets)
@@ -6,31 +6,71 @@ Author: Mindy Stricklin
 import os
 import json
 import csv
-from datetime import datetime
+import copy
 import shutil
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.atomic_file import atomic_write_json, read_json
+from utils.backup_store import BackupStore
 
 class DataManager:
-    def __init__(self, data_folder='data'):
+    def __init__(self, data_folder='data', lock_files=False):
         self.data_folder = data_folder
+        self.lock_files = lock_files
         self.ensure_data_folder()
+        self._backups = None  # Created by the first backup operation
+        self._health_cache = {}  # file path -> ((size, mtime), result)
     
     def ensure_data_folder(self):
         """Create data folder if it doesn't exist"""
         if not os.path.exists(self.data_folder):
             os.makedirs(self.data_folder)
     
+    @property
+    def backups(self):
+        """The backup store, created on first use"""
+        if self._backups is None:
+            self._backups = BackupStore(self.data_folder)
+        return self._backups
+    
     def backup_data(self):
-        """Create a backup of all data files"""
+        """
+        Create a backup of all data files. Only files changed since the
+        last backup are read and stored; the rest are linked to it
+        """
         try:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            backup_folder = f"{self.data_folder}_backup_{timestamp}"
-            
-            shutil.copytree(self.data_folder, backup_folder)
-            return True, f"Backup created: {backup_folder}"
+            name, stats = self.backups.create_snapshot()
+            return True, (f"Backup created: {name} ({stats['stored']} files stored, "
+                          f"{stats['unchanged'] + stats['reused']} unchanged)")
             
         except Exception as e:
             return False, f"Backup failed: {str(e)}"
     
+    def list_backups(self):
+        """Get the names of all backups, oldest first"""
+        try:
+            return self.backups.list_snapshots()
+        except Exception as e:
+            print(f"Error listing backups: {str(e)}")
+            return []
+    
+    def restore_backup(self, name):
+        """
+        Restore the data folder to a backup. The current data is backed
+        up first, so a restore can itself be undone
+        """
+        try:
+            if name not in self.backups.list_snapshots():
+                return False, f"Backup not found: {name}"
+            
+            current, stats = self.backups.create_snapshot()
+            restored = self.backups.restore_snapshot(name)
+            return True, f"Restored {restored} files from {name} (previous data saved as {current})"
+            
+        except Exception as e:
+            return False, f"Restore failed: {str(e)}"
+    
     def validate_json_file(self, file_path):
         """Validate if a JSON file is properly formatted"""
         try:
@@ -83,32 +123,40 @@ class DataManager:
         return f"{size_bytes:.1f} {size_names[i]}"
     
     def clean_old_backups(self, keep_count=5):
-        """Clean up old backup folders, keeping only the most recent ones"""
+        """
+        Remove all but the most recent backups. Stored files are freed
+        only once no remaining backup refers to them.
+        
+        Full-copy '<data>_backup_<timestamp>' folders made before backups
+        became incremental are not migrated or listed; the most recent
+        keep_count of them are kept, as before, and the rest removed
+        """
         try:
-            # Find all backup folders
-            backup_folders = []
-            for item in os.listdir('.'):
-                if item.startswith(f"{self.data_folder}_backup_") and os.path.isdir(item):
-                    backup_folders.append(item)
-            
-            # Sort by name (which includes timestamp)
-            backup_folders.sort(reverse=True)
-            
-            # Remove old backups
-            removed_count = 0
-            for folder in backup_folders[keep_count:]:
-                try:
-                    shutil.rmtree(folder)
-                    removed_count += 1
-                except Exception as e:
-                    print(f"Error removing backup {folder}: {str(e)}")
-            
-            return removed_count
+            removed_count, removed_files = self.backups.prune(keep_count)
+            return removed_count + self._clean_legacy_backups(keep_count)
             
         except Exception as e:
             print(f"Error cleaning backups: {str(e)}")
             return 0
     
+    def _clean_legacy_backups(self, keep_count):
+        """Remove all but the newest keep_count full-copy backup folders"""
+        parent = os.path.dirname(os.path.abspath(self.data_folder))
+        prefix = f"{os.path.basename(os.path.abspath(self.data_folder))}_backup_"
+        legacy_folders = sorted((item for item in os.listdir(parent)
+                                 if item.startswith(prefix)
+                                 and os.path.isdir(os.path.join(parent, item))),
+                                reverse=True)
+        
+        removed_count = 0
+        for folder in legacy_folders[keep_count:]:
+            try:
+                shutil.rmtree(os.path.join(parent, folder))
+                removed_count += 1
+            except Exception as e:
+                print(f"Error removing backup {folder}: {str(e)}")
+        return removed_count
+    
     def export_data_summary(self):
         """Export a summary of all data files"""
         summary = {
@@ -133,38 +181,67 @@ class DataManager:
             else:
                 summary['files'][filename] = {'status': 'not_found'}
         
+        # Closed months of the history live in compressed segments
+        segments = self.get_history_segments_summary()
+        if segments is not None:
+            summary['files']['history_segments'] = segments
+        
         return summary
     
+    def get_history_segments_summary(self):
+        """
+        Summarize the compressed history segments from their index:
+        segment and record counts, total size and any missing files.
+        Returns None if the history has never rotated
+        """
+        folder = os.path.join(self.data_folder, 'history_segments')
+        index_file = os.path.join(folder, 'index.json')
+        if not os.path.exists(index_file):
+            return None
+        
+        try:
+            segments = read_json(index_file)['segments']
+        except Exception as e:
+            return {'status': 'invalid', 'error': f"Segment index error: {str(e)}"}
+        
+        size_bytes = 0
+        missing = []
+        for segment in segments:
+            segment_path = os.path.join(folder, segment['file'])
+            if os.path.exists(segment_path):
+                size_bytes += os.path.getsize(segment_path)
+            else:
+                missing.append(segment['file'])
+        
+        return {
+            'status': 'ok' if not missing else 'error',
+            'segment_count': len(segments),
+            'record_count': sum(segment['records'] for segment in segments),
+            'size_bytes': size_bytes,
+            'size_readable': self.format_file_size(size_bytes),
+            'missing': missing,
+            'error': f"Missing history segments: {', '.join(missing)}" if missing else None
+        }
+    
     def safe_write_json(self, data, file_path):
-        """Safely write JSON data to file with backup"""
+        """
+        Safely write JSON data to file. The new file is written and
+        fsynced beside the old one and renamed over it, so a crash leaves
+        either the old or the new contents and no backup copy is needed
+        """
         try:
-            # Create backup if file exists
-            if os.path.exists(file_path):
-                backup_path = f"{file_path}.backup"
-                shutil.copy2(file_path, backup_path)
-            
-            # Write new data
-            with open(file_path, 'w') as f:
-                json.dump(data, f, indent=2)
-            
-            # Remove backup if write was successful
-            backup_path = f"{file_path}.backup"
-            if os.path.exists(backup_path):
-                os.remove(backup_path)
-            
+            atomic_write_json(file_path, data, indent=2, lock=self.lock_files)
             return True
             
         except Exception as e:
-            # Restore backup if write failed
-            backup_path = f"{file_path}.backup"
-            if os.path.exists(backup_path):
-                shutil.copy2(backup_path, file_path)
-                os.remove(backup_path)
-            
             raise Exception(f"Error writing JSON file: {str(e)}")
     
     def get_data_health_report(self):
-        """Generate a health report for all data files"""
+        """
+        Generate a health report for all data files. Files are checked
+        in parallel, each in a single streaming pass, and a file's result
+        is reused until its size or modification time changes
+        """
         report = {
             'timestamp': datetime.now().isoformat(),
             'overall_status': 'healthy',
@@ -172,45 +249,170 @@ class DataManager:
             'files': {}
         }
         
-        # Check weather history
-        history_file = os.path.join(self.data_folder, 'weather_history.txt')
-        if os.path.exists(history_file):
-            try:
-                with open(history_file, 'r') as f:
-                    lines = f.readlines()
-                report['files']['weather_history.txt'] = {
-                    'status': 'ok',
-                    'record_count': len(lines)
-                }
-            except Exception as e:
-                report['files']['weather_history.txt'] = {'status': 'error', 'error': str(e)}
-                report['issues'].append(f"Weather history file error: {str(e)}")
-        else:
-            report['files']['weather_history.txt'] = {'status': 'missing'}
-        
-        # Check journal entries
-        journal_file = os.path.join(self.data_folder, 'journal_entries.json')
-        if os.path.exists(journal_file):
-            valid, message = self.validate_json_file(journal_file)
-            if valid:
+        checks = [
+            ('weather_history.txt', check_history_file, "Weather history"),
+            ('journal_entries.json', check_json_file, "Journal"),
+            ('journal_log.jsonl', check_json_lines_file, "Journal log"),
+            ('alert_preferences.json', check_json_file, "Alert preferences")
+        ]
+        
+        pending = {}
+        with ThreadPoolExecutor(max_workers=len(checks)) as executor:
+            for filename, check, label in checks:
+                file_path = os.path.join(self.data_folder, filename)
+                fingerprint = self._file_fingerprint(file_path)
+                cached = self._health_cache.get(file_path)
+                
+                if fingerprint is None:
+                    report['files'][filename] = {'status': 'missing'}
+                elif cached is not None and cached[0] == fingerprint:
+                    report['files'][filename] = copy.deepcopy(cached[1])
+                else:
+                    pending[filename] = (executor.submit(check, file_path), file_path, fingerprint)
+            
+            for filename, (future, file_path, fingerprint) in pending.items():
                 try:
-                    with open(journal_file, 'r') as f:
-                        data = json.load(f)
-                    report['files']['journal_entries.json'] = {
-                        'status': 'ok',
-                        'entry_count': len(data) if isinstance(data, list) else 'unknown'
-                    }
+                    result = future.result()
                 except Exception as e:
-                    report['files']['journal_entries.json'] = {'status': 'error', 'error': str(e)}
-                    report['issues'].append(f"Journal file error: {str(e)}")
-            else:
-                report['files']['journal_entries.json'] = {'status': 'invalid', 'error': message}
-                report['issues'].append(f"Journal file invalid: {message}")
-        else:
-            report['files']['journal_entries.json'] = {'status': 'missing'}
+                    result = {'status': 'error', 'error': str(e)}
+                
+                # Only cache a result if the file did not change while it was read
+                if self._file_fingerprint(file_path) == fingerprint:
+                    self._health_cache[file_path] = (fingerprint, copy.deepcopy(result))
+                report['files'][filename] = result
+        
+        self._add_segment_counts(report['files'])
+        
+        for filename, check, label in checks:
+            result = report['files'][filename]
+            if result['status'] in ('error', 'invalid'):
+                report['issues'].append(f"{label} file {result['status']}: {result['error']}")
+            elif result.get('invalid_count'):
+                report['issues'].append(f"{label} file has {result['invalid_count']} invalid rows")
         
         # Set overall status
         if report['issues']:
             report['overall_status'] = 'has_issues'
         
         return report
+    
+    def _add_segment_counts(self, files):
+        """
+        Add the records in rotated history segments to the history
+        result, so record_count covers the whole history and not only
+        the active file
+        """
+        segments = self.get_history_segments_summary()
+        if segments is None:
+            return
+        
+        result = files['weather_history.txt']
+        if result['status'] == 'missing':
+            # Right after a rotation, before the next record is written
+            result = files['weather_history.txt'] = {'status': 'ok', 'record_count': 0}
+        if 'record_count' not in result:
+            return
+        
+        result['active_record_count'] = result['record_count']
+        result['segment_count'] = segments.get('segment_count', 0)
+        result['segment_record_count'] = segments.get('record_count', 0)
+        result['record_count'] += result['segment_record_count']
+        if segments['status'] != 'ok' and result['status'] == 'ok':
+            result['status'] = segments['status']
+            result['error'] = segments['error']
+    
+    @staticmethod
+    def _file_fingerprint(file_path):
+        """Get a file's (size, mtime), or None if it does not exist"""
+        try:
+            stat = os.stat(file_path)
+            return (stat.st_size, stat.st_mtime_ns)
+        except FileNotFoundError:
+            return None
+
+def _add_invalid_row(result, reason, line_number, max_examples):
+    """Count an invalid row and keep the first few as examples"""
+    result['invalid_rows'][reason] = result['invalid_rows'].get(reason, 0) + 1
+    result['invalid_count'] += 1
+    if len(result['examples']) < max_examples:
+        result['examples'].append({'line': line_number, 'reason': reason})
+
+def check_history_file(file_path, max_examples=5):
+    """
+    Count and validate the rows of a history file in one pass, holding
+    one line at a time. A row needs 5 or 6 fields, a YYYY-MM-DD date,
+    a numeric temperature and a numeric (or N/A) pressure. Lines are
+    checked as bytes, which skips decoding every row
+    """
+    result = {'status': 'ok', 'record_count': 0, 'invalid_count': 0,
+              'invalid_rows': {}, 'examples': []}
+    valid_dates = set()
+    
+    with open(file_path, 'rb') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            
+            parts = line.split(b',')
+            if len(parts) not in (5, 6):
+                _add_invalid_row(result, 'field_count', line_number, max_examples)
+                continue
+            
+            # Few distinct dates repeat across many rows, so each is parsed once
+            date = parts[0]
+            if date not in valid_dates:
+                try:
+                    datetime.strptime(date.decode('ascii'), '%Y-%m-%d')
+                    valid_dates.add(date)
+                except (UnicodeDecodeError, ValueError):
+                    _add_invalid_row(result, 'date', line_number, max_examples)
+                    continue
+            
+            try:
+                float(parts[3])
+            except ValueError:
+                _add_invalid_row(result, 'temp', line_number, max_examples)
+                continue
+            
+            if len(parts) == 6 and parts[5] != b'N/A':
+                try:
+                    float(parts[5])
+                except ValueError:
+                    _add_invalid_row(result, 'pressure', line_number, max_examples)
+                    continue
+            
+            result['record_count'] += 1
+    
+    return result
+
+def check_json_file(file_path):
+    """Validate a JSON file and count its entries with a single parse"""
+    try:
+        with open(file_path, 'r') as f:
+            data = json.load(f)
+    except json.JSONDecodeError as e:
+        return {'status': 'invalid', 'error': f"JSON error: {str(e)}"}
+    
+    return {
+        'status': 'ok',
+        'entry_count': len(data) if isinstance(data, (list, dict)) else 'unknown'
+    }
+
+def check_json_lines_file(file_path, max_examples=5):
+    """Count and validate the records of a JSON Lines file in one pass"""
+    result = {'status': 'ok', 'record_count': 0, 'invalid_count': 0,
+              'invalid_rows': {}, 'examples': []}
+    
+    with open(file_path, 'rb') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                json.loads(line)
+                result['record_count'] += 1
+            except (UnicodeDecodeError, json.JSONDecodeError):
+                _add_invalid_row(result, 'json', line_number, max_examples)
+    
+    return result
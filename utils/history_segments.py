@@ -0,0 +1,183 @@
+"""
+Compressed history segments for Weather Dashboard
+Author: Mindy Stricklin
+"""
+
+import os
+import gzip
+import lzma
+import shutil
+
+from utils.atomic_file import atomic_write_json, read_json, fsync_folder
+
+class HistorySegments:
+    """
+    Closed, compressed pieces of the text history file. When the history
+    rotates, the active file is moved into the segments folder and
+    compressed there; a small index records each segment's date range,
+    cities and record count, so a query opens only the segments that
+    can hold what it asks for, decompressing them as a stream.
+    
+    Segments are named in rotation order. An uncompressed '.txt' left in
+    the folder by a crash mid-rotation is compressed again on load, and
+    the index is rebuilt for any segment it does not describe.
+    """
+    
+    OPENERS = {'.gz': gzip.open, '.xz': lzma.open}
+    EXTENSIONS = {'gzip': '.gz', 'lzma': '.xz'}
+    
+    def __init__(self, folder, compression='gzip'):
+        if compression not in self.EXTENSIONS:
+            raise ValueError(f"Unknown history compression: {compression}")
+        self.folder = folder
+        self.compression = compression
+        self.index_file = os.path.join(folder, 'index.json')
+        self.segments = []
+        self.load()
+    
+    def load(self):
+        """Load the index, finishing any interrupted rotation first"""
+        self.segments = []
+        if not os.path.exists(self.folder):
+            return
+        
+        recovered = {}
+        for filename in sorted(os.listdir(self.folder)):
+            if filename.endswith('.tmp'):
+                os.remove(os.path.join(self.folder, filename))
+            elif filename.endswith('.txt'):
+                segment = self._compress(os.path.join(self.folder, filename))
+                recovered[segment['file']] = segment
+        
+        indexed = {}
+        try:
+            if os.path.exists(self.index_file):
+                indexed = {segment['file']: segment for segment in read_json(self.index_file)['segments']}
+        except Exception as e:
+            print(f"Error loading history segment index: {str(e)}")
+        
+        changed = False
+        for filename in sorted(os.listdir(self.folder)):
+            if os.path.splitext(filename)[1] not in self.OPENERS:
+                continue
+            segment = indexed.pop(filename, None)
+            if segment is None:
+                segment = recovered.get(filename) or self._describe(filename, self._iter_segment_lines(filename))
+                changed = True
+            self.segments.append(segment)
+        
+        if changed or indexed:
+            self.save()
+    
+    def save(self):
+        """Write the segment index"""
+        try:
+            atomic_write_json(self.index_file, {'segments': self.segments}, indent=2)
+            return True
+        except Exception as e:
+            print(f"Error saving history segment index: {str(e)}")
+            return False
+    
+    def paths(self):
+        """Get the path of every segment, oldest first"""
+        return [os.path.join(self.folder, segment['file']) for segment in self.segments]
+    
+    @staticmethod
+    def _describe(filename, lines):
+        """Build a segment's index entry from its lines"""
+        segment = {'file': filename, 'first_date': None, 'last_date': None,
+                   'cities': [], 'records': 0}
+        cities = set()
+        for line in lines:
+            parts = line.strip().split(',')
+            if len(parts) < 5:
+                continue
+            segment['records'] += 1
+            cities.add(parts[1])
+            if segment['first_date'] is None or parts[0] < segment['first_date']:
+                segment['first_date'] = parts[0]
+            if segment['last_date'] is None or parts[0] > segment['last_date']:
+                segment['last_date'] = parts[0]
+        segment['cities'] = sorted(cities)
+        return segment
+    
+    def close_segment(self, history_file):
+        """
+        Move the active history file into a new compressed segment.
+        Returns the new segment's index entry
+        """
+        if not os.path.exists(self.folder):
+            os.makedirs(self.folder)
+        
+        number = len(self.segments) + 1
+        for filename in os.listdir(self.folder):
+            if filename.startswith('segment_'):
+                number = max(number, int(filename[len('segment_'):].split('.')[0]) + 1)
+        
+        # Once the file is in the folder, a crash is finished by load()
+        pending_path = os.path.join(self.folder, f"segment_{number:05d}.txt")
+        os.replace(history_file, pending_path)
+        fsync_folder(os.path.dirname(history_file))
+        
+        segment = self._compress(pending_path)
+        self.segments.append(segment)
+        self.save()
+        return segment
+    
+    def _compress(self, pending_path):
+        """
+        Compress an uncompressed segment, describing it in the same pass,
+        then remove the original. Returns the segment's index entry
+        """
+        filename = os.path.basename(pending_path) + self.EXTENSIONS[self.compression]
+        segment_path = os.path.join(self.folder, filename)
+        temp_path = f"{segment_path}.tmp"
+        
+        def copied_lines(source, target):
+            for line in source:
+                target.write(line)
+                yield line.decode('utf-8', errors='replace')
+        
+        opener = self.OPENERS[self.EXTENSIONS[self.compression]]
+        with open(pending_path, 'rb') as source, opener(temp_path, 'wb') as target:
+            segment = self._describe(filename, copied_lines(source, target))
+        
+        with open(temp_path, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(temp_path, segment_path)
+        os.remove(pending_path)
+        fsync_folder(self.folder)
+        return segment
+    
+    def _iter_segment_lines(self, filename):
+        """Yield the lines of one segment, decompressing as they are read"""
+        opener = self.OPENERS[os.path.splitext(filename)[1]]
+        with opener(os.path.join(self.folder, filename), 'rt') as f:
+            for line in f:
+                yield line
+    
+    def iter_lines(self, segments=None):
+        """Yield the lines of the given segments (default all), oldest first"""
+        for segment in self.segments if segments is None else segments:
+            yield from self._iter_segment_lines(segment['file'])
+    
+    def select(self, start_date=None, end_date=None, city=None):
+        """Get the segments that may hold records matching a date range and city"""
+        selected = []
+        for segment in self.segments:
+            if not segment['records']:
+                continue
+            if start_date is not None and segment['last_date'] < start_date:
+                continue
+            if end_date is not None and segment['first_date'] > end_date:
+                continue
+            if city is not None and city not in segment['cities']:
+                continue
+            selected.append(segment)
+        return selected
+    
+    def clear(self):
+        """Remove every segment and the index"""
+        if os.path.exists(self.folder):
+            shutil.rmtree(self.folder)
+        self.segments = []
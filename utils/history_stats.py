@@ -0,0 +1,191 @@
+"""
+Running statistics for the weather history file
+Author: Mindy Stricklin
+"""
+
+import os
+import json
+
+from utils.atomic_file import atomic_write_json
+
+class HistoryStats:
+    """
+    Running aggregates over every history record: count, temperature
+    sum/min/max, a condition histogram and the same per city. The
+    totals are saved in a small sidecar file together with the size and
+    modification time of the history files they describe, so a stale
+    sidecar is detected. A sidecar that is only behind by appended lines
+    is brought up to date from the file's tail; anything else is rebuilt.
+    """
+    
+    def __init__(self, stats_file):
+        self.stats_file = stats_file
+        self.reset()
+    
+    def reset(self):
+        """Forget every aggregate"""
+        self.totals = self._empty_totals()
+        self.cities = {}
+        self.fingerprint = None
+        self.unsaved_changes = 0
+    
+    @staticmethod
+    def _empty_totals():
+        return {
+            'count': 0,
+            'temp_count': 0,
+            'temp_sum': 0.0,
+            'temp_min': None,
+            'temp_max': None,
+            'conditions': {}
+        }
+    
+    @classmethod
+    def file_fingerprint(cls, file_path):
+        """
+        Get the (size, mtime) pair used to detect changes to a file. For
+        a list of files, such as history segments followed by the active
+        file, the pairs are concatenated in order
+        """
+        if not isinstance(file_path, str):
+            fingerprint = []
+            for path in file_path:
+                fingerprint.extend(cls.file_fingerprint(path))
+            return fingerprint
+        
+        if not os.path.exists(file_path):
+            return [0, 0]
+        stat = os.stat(file_path)
+        return [stat.st_size, stat.st_mtime_ns]
+    
+    @staticmethod
+    def _update(totals, temp, condition):
+        """Fold one observation into a totals dict"""
+        totals['count'] += 1
+        totals['conditions'][condition] = totals['conditions'].get(condition, 0) + 1
+        
+        try:
+            temp = float(temp)
+        except (TypeError, ValueError):
+            return
+        
+        totals['temp_count'] += 1
+        totals['temp_sum'] += temp
+        if totals['temp_min'] is None or temp < totals['temp_min']:
+            totals['temp_min'] = temp
+        if totals['temp_max'] is None or temp > totals['temp_max']:
+            totals['temp_max'] = temp
+    
+    def add(self, record):
+        """Add one record dict to the running aggregates"""
+        self._update(self.totals, record['temp'], record['condition'])
+        
+        key = f"{record['city']}|{record['state']}"
+        if key not in self.cities:
+            self.cities[key] = self._empty_totals()
+        self._update(self.cities[key], record['temp'], record['condition'])
+    
+    def rebuild(self, records, history_file):
+        """Recompute every aggregate from scratch"""
+        self.reset()
+        for record in records:
+            self.add(record)
+        self.fingerprint = self.file_fingerprint(history_file)
+    
+    def is_current(self, history_file):
+        """Check whether these aggregates still describe the history file"""
+        return self.fingerprint == self.file_fingerprint(history_file)
+    
+    def appended_offset(self, history_file):
+        """
+        If the history files changed only by lines appended to the last
+        one, get the size of that file these aggregates already cover, so
+        only the tail after it needs to be folded in. Returns None when
+        the files changed some other way and a rebuild is needed
+        """
+        if self.fingerprint is None:
+            return None
+        files = [history_file] if isinstance(history_file, str) else list(history_file)
+        fingerprint = self.file_fingerprint(files)
+        if len(fingerprint) != len(self.fingerprint) or fingerprint[:-2] != self.fingerprint[:-2]:
+            return None
+        
+        offset = self.fingerprint[-2]
+        if fingerprint[-2] < offset:
+            return None
+        if offset:
+            # The covered part must end on a complete line
+            with open(files[-1], 'rb') as f:
+                f.seek(offset - 1)
+                if f.read(1) != b'\n':
+                    return None
+        return offset
+    
+    def load(self):
+        """Load aggregates from the sidecar file; returns False if unavailable"""
+        try:
+            if not os.path.exists(self.stats_file):
+                return False
+            
+            with open(self.stats_file, 'r') as f:
+                stored = json.load(f)
+            
+            self.totals = stored['totals']
+            self.cities = stored['cities']
+            self.fingerprint = stored['fingerprint']
+            return True
+            
+        except Exception as e:
+            print(f"Error loading history statistics: {str(e)}")
+            self.reset()
+            return False
+    
+    def mark_current(self, history_file):
+        """Record that these aggregates now describe the history file"""
+        self.fingerprint = self.file_fingerprint(history_file)
+        self.unsaved_changes += 1
+    
+    def save(self, history_file=None):
+        """Write the sidecar file, first re-fingerprinting history_file if given"""
+        if history_file is not None:
+            self.fingerprint = self.file_fingerprint(history_file)
+        
+        try:
+            # The aggregates can be rebuilt, so skip the fsyncs
+            atomic_write_json(self.stats_file, {
+                'fingerprint': self.fingerprint,
+                'totals': self.totals,
+                'cities': self.cities
+            }, fsync=False)
+            self.unsaved_changes = 0
+            return True
+            
+        except Exception as e:
+            print(f"Error saving history statistics: {str(e)}")
+            return False
+    
+    def delete(self):
+        """Remove the sidecar file and reset the aggregates"""
+        self.reset()
+        if os.path.exists(self.stats_file):
+            os.remove(self.stats_file)
+    
+    @staticmethod
+    def _describe(totals):
+        """Turn a totals dict into a statistics dict with the average"""
+        temp_count = totals['temp_count']
+        return {
+            'count': totals['count'],
+            'avg_temp': totals['temp_sum'] / temp_count if temp_count else None,
+            'min_temp': totals['temp_min'],
+            'max_temp': totals['temp_max'],
+            'conditions': dict(totals['conditions'])
+        }
+    
+    def get_statistics(self):
+        """Get overall and per-city statistics"""
+        statistics = self._describe(self.totals)
+        statistics['cities'] = {}
+        for key, totals in self.cities.items():
+            statistics['cities'][key] = self._describe(totals)
+        return statistics
@@ -0,0 +1,70 @@
+"""
+Shared HTTP transport for Weather Dashboard
+Author: Mindy Stricklin
+"""
+
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+class HTTPTransport:
+    """
+    Pooled keep-alive HTTP transport built on a requests.Session.
+    Connections to the same host are reused across requests instead
+    of opening a new TCP+TLS connection every time.
+    """
+    
+    def __init__(self, pool_size=10, connect_timeout=3.05, read_timeout=10, keep_alive=True):
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.keep_alive = keep_alive
+        self.session = self._create_session()
+    
+    def _create_session(self):
+        """Create a session with a connection pool mounted for http and https"""
+        session = requests.Session()
+        
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        
+        session.headers['Connection'] = 'keep-alive' if self.keep_alive else 'close'
+        return session
+    
+    def get_timeout(self):
+        """Get the (connect, read) timeout tuple used for requests"""
+        return (self.connect_timeout, self.read_timeout)
+    
+    def get(self, url, params=None, timeout=None):
+        """Send a GET request through the pooled session"""
+        if timeout is None:
+            timeout = self.get_timeout()
+        
+        return self.session.get(url, params=params, timeout=timeout)
+    
+    def close(self):
+        """Close all pooled connections"""
+        self.session.close()
+
+
+_shared_transport = None
+_shared_lock = threading.Lock()
+
+def get_shared_transport():
+    """Get the process-wide transport, creating it on first use"""
+    global _shared_transport
+    
+    with _shared_lock:
+        if _shared_transport is None:
+            _shared_transport = HTTPTransport()
+        return _shared_transport
+
+def set_shared_transport(transport):
+    """Replace the process-wide transport (e.g. with configured settings)"""
+    global _shared_transport
+    
+    with _shared_lock:
+        if _shared_transport is not None and _shared_transport is not transport:
+            _shared_transport.close()
+        _shared_transport = transport
@@ -0,0 +1,105 @@
+"""
+Token-bucket rate limiter for Weather Dashboard
+Author: Mindy Stricklin
+"""
+
+import time
+import asyncio
+import threading
+
+class TokenBucket:
+    """
+    Thread-safe token-bucket rate limiter.
+    
+    Tokens refill at `rate` per second up to `burst`. Each caller
+    reserves a token under the lock and then sleeps outside of it, so
+    one bucket can be shared by many threads and asyncio tasks, and
+    waiting callers are served in the order they arrived.
+    """
+    
+    def __init__(self, rate=1.0, burst=1):
+        if rate <= 0:
+            raise ValueError("Rate must be greater than zero")
+        if burst < 1:
+            raise ValueError("Burst must be at least 1")
+        
+        self.rate = float(rate)
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        
+        # Wait statistics
+        self.requests = 0
+        self.delayed_requests = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+    
+    @classmethod
+    def per_minute(cls, requests_per_minute, burst=1):
+        """
+        Create a bucket that never exceeds a per-minute quota. The refill
+        rate leaves room for a full burst inside any 60 second window.
+        """
+        if burst >= requests_per_minute:
+            raise ValueError("Burst must be smaller than the per-minute quota")
+        
+        return cls(rate=(requests_per_minute - burst) / 60.0, burst=burst)
+    
+    def _refill(self, now):
+        """Add the tokens earned since the last update (lock must be held)"""
+        elapsed = now - self._updated
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._updated = now
+    
+    def reserve(self, tokens=1):
+        """
+        Take tokens from the bucket and return how many seconds the
+        caller has to wait before using them
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            
+            self.requests += 1
+            if wait > 0:
+                self.delayed_requests += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+            
+            return wait
+    
+    def acquire(self, tokens=1):
+        """Block until tokens are available; returns the seconds waited"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+    
+    async def acquire_async(self, tokens=1):
+        """Wait without blocking the event loop; returns the seconds waited"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+    
+    def estimate_wait(self, tokens=1):
+        """How long a caller arriving now would wait, without reserving"""
+        with self._lock:
+            self._refill(time.monotonic())
+            shortfall = tokens - self._tokens
+            return shortfall / self.rate if shortfall > 0 else 0.0
+    
+    def get_stats(self):
+        """Get wait statistics for callers of this bucket"""
+        with self._lock:
+            return {
+                'rate_per_second': self.rate,
+                'burst': self.burst,
+                'requests': self.requests,
+                'delayed_requests': self.delayed_requests,
+                'total_wait': self.total_wait,
+                'max_wait': self.max_wait,
+                'average_wait': self.total_wait / self.requests if self.requests else 0.0
+            }
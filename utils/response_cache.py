@@ -0,0 +1,189 @@
+"""
+Response cache for the OpenWeatherMap API client
+Author: Mindy Stricklin
+"""
+
+import os
+import copy
+import json
+import time
+import atexit
+import threading
+from collections import OrderedDict
+
+from utils.atomic_file import atomic_write_json
+
+class ResponseCache:
+    """
+    Bounded in-memory cache of API responses with per-endpoint TTLs
+    and least-recently-used eviction. Can optionally be mirrored to a
+    JSON file so cached responses survive a restart.
+    
+    The cache keeps its own copy of every response and hands out a fresh
+    copy on each hit, so callers may modify what they get. Changes are
+    written to the file at most once per save_delay seconds on a timer
+    thread, and once more at exit.
+    """
+    
+    # Params that never take part in the cache key
+    IGNORED_PARAMS = ('appid',)
+    
+    def __init__(self, max_entries=256, ttls=None, default_ttl=600, cache_file=None, save_delay=5.0):
+        self.max_entries = max_entries
+        self.ttls = ttls if ttls is not None else {'weather': 600, 'forecast': 1800}
+        self.default_ttl = default_ttl
+        self.cache_file = cache_file
+        self.save_delay = save_delay
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._save_timer = None
+        self._dirty = False
+        
+        if self.cache_file:
+            self.load()
+            atexit.register(self.flush)
+    
+    def make_key(self, endpoint, params):
+        """Build a cache key from the endpoint and normalized params"""
+        normalized = []
+        for name in sorted(params):
+            if name in self.IGNORED_PARAMS:
+                continue
+            value = params[name]
+            # Format every number alike, so 40 and 40.0 share a key
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                value = f"{float(value):.4f}"
+            else:
+                value = str(value).strip().lower()
+            normalized.append(f"{name}={value}")
+        
+        return f"{endpoint}?{'&'.join(normalized)}"
+    
+    def get_ttl(self, endpoint):
+        """Get the time-to-live in seconds for an endpoint"""
+        return self.ttls.get(endpoint, self.default_ttl)
+    
+    def get(self, endpoint, params):
+        """
+        Get a cached response, or None if missing or expired
+        """
+        key = self.make_key(endpoint, params)
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            if time.time() >= entry['expires_at']:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(entry['data'])
+    
+    def put(self, endpoint, params, data):
+        """Store a response, evicting the least recently used entries if full"""
+        key = self.make_key(endpoint, params)
+        
+        with self._lock:
+            self._entries[key] = {
+                'expires_at': time.time() + self.get_ttl(endpoint),
+                'data': copy.deepcopy(data)
+            }
+            self._entries.move_to_end(key)
+            
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        
+        if self.cache_file:
+            self._schedule_save()
+    
+    def clear(self):
+        """Remove all cached responses"""
+        with self._lock:
+            self._entries.clear()
+        
+        if self.cache_file:
+            self._schedule_save()
+    
+    def _schedule_save(self):
+        """Mark the cache changed and start the save timer if none is pending"""
+        with self._lock:
+            self._dirty = True
+            if self._save_timer is not None:
+                return
+            self._save_timer = threading.Timer(self.save_delay, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+    
+    def flush(self):
+        """Write pending changes to the cache file now"""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if not self._dirty:
+                return True
+            self._dirty = False
+        
+        if not self.save():
+            with self._lock:
+                self._dirty = True
+            return False
+        return True
+    
+    def get_stats(self):
+        """Get hit/miss counters for the cache"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'hit_rate': self.hits / total if total else 0.0
+            }
+    
+    def load(self):
+        """Load unexpired entries from the cache file"""
+        try:
+            if not os.path.exists(self.cache_file):
+                return
+            
+            with open(self.cache_file, 'r') as f:
+                stored = json.load(f)
+            
+            now = time.time()
+            with self._lock:
+                for key, entry in stored.items():
+                    if entry['expires_at'] > now:
+                        self._entries[key] = entry
+                
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    
+        except Exception as e:
+            print(f"Error loading response cache: {str(e)}")
+    
+    def save(self):
+        """Write the cache to disk, replacing the old file in one step"""
+        try:
+            with self._lock:
+                snapshot = dict(self._entries)
+            
+            with self._save_lock:
+                atomic_write_json(self.cache_file, snapshot, fsync=False)
+            return True
+            
+        except Exception as e:
+            print(f"Error saving response cache: {str(e)}")
+            return False
@@ -0,0 +1,172 @@
+"""
+Inverted full-text index for Weather Dashboard
+Author: Mindy Stricklin
+"""
+
+import os
+import re
+import json
+import math
+import bisect
+
+from utils.atomic_file import atomic_write_json
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+class SearchIndex:
+    """
+    Maps each lowercased word to the documents containing it and how
+    often. A sorted vocabulary list lets a query term match every word
+    that starts with it using two binary searches. The per-document
+    word counts are saved in a sidecar file together with a fingerprint
+    of the data they were built from, so a stale index is detected.
+    """
+    
+    def __init__(self, index_file):
+        self.index_file = index_file
+        self.reset()
+    
+    def reset(self):
+        """Forget every document"""
+        self.documents = {}
+        self.postings = {}
+        self.vocabulary = []
+        self.fingerprint = None
+        self.unsaved_changes = 0
+    
+    @staticmethod
+    def tokenize(text):
+        """Split text into lowercase words"""
+        return TOKEN_PATTERN.findall(text.lower()) if text else []
+    
+    def add(self, doc_key, text):
+        """Index a document, replacing any earlier version of it"""
+        if doc_key in self.documents:
+            self.remove(doc_key)
+        
+        counts = self._count_tokens(text)
+        self.documents[doc_key] = counts
+        for token, count in counts.items():
+            if token not in self.postings:
+                self.postings[token] = {}
+                bisect.insort(self.vocabulary, token)
+            self.postings[token][doc_key] = count
+    
+    def _count_tokens(self, text):
+        """Count how often each word appears in text"""
+        counts = {}
+        for token in self.tokenize(text):
+            counts[token] = counts.get(token, 0) + 1
+        return counts
+    
+    def _load_documents(self, documents):
+        """Index (doc_key, word counts) pairs, sorting the vocabulary once"""
+        self.reset()
+        for doc_key, counts in documents:
+            self.documents[doc_key] = counts
+            for token, count in counts.items():
+                self.postings.setdefault(token, {})[doc_key] = count
+        self.vocabulary = sorted(self.postings)
+    
+    def remove(self, doc_key):
+        """Drop a document from the index"""
+        counts = self.documents.pop(doc_key, None)
+        if counts is None:
+            return
+        
+        for token in counts:
+            docs = self.postings[token]
+            del docs[doc_key]
+            if not docs:
+                del self.postings[token]
+                del self.vocabulary[bisect.bisect_left(self.vocabulary, token)]
+    
+    def rebuild(self, documents, fingerprint):
+        """Index every (doc_key, text) pair from scratch"""
+        self._load_documents(
+            (doc_key, self._count_tokens(text)) for doc_key, text in documents
+        )
+        self.fingerprint = fingerprint
+    
+    def _matching_tokens(self, term, prefix):
+        """Get the indexed words a query term matches"""
+        if not prefix:
+            return [term] if term in self.postings else []
+        
+        # Every word starting with term sorts between these two bounds
+        start = bisect.bisect_left(self.vocabulary, term)
+        end = bisect.bisect_left(self.vocabulary, term + '\U0010ffff')
+        return self.vocabulary[start:end]
+    
+    def search(self, query, prefix=True):
+        """
+        Find documents containing every query term (or a word starting
+        with it when prefix is True). Returns [(doc_key, score)] with the
+        best matches first, scored by term frequency times inverse
+        document frequency.
+        """
+        terms = self.tokenize(query)
+        if not terms:
+            return []
+        
+        total_docs = len(self.documents)
+        scores = None
+        
+        for term in terms:
+            term_scores = {}
+            for token in self._matching_tokens(term, prefix):
+                docs = self.postings[token]
+                weight = math.log(1 + total_docs / len(docs))
+                for doc_key, count in docs.items():
+                    term_scores[doc_key] = term_scores.get(doc_key, 0.0) + count * weight
+            
+            # AND: keep only documents matched by every term so far
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {
+                    doc_key: score + term_scores[doc_key]
+                    for doc_key, score in scores.items() if doc_key in term_scores
+                }
+            if not scores:
+                return []
+        
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    
+    def mark_current(self, fingerprint):
+        """Record that the index now describes the data with this fingerprint"""
+        self.fingerprint = fingerprint
+        self.unsaved_changes += 1
+    
+    def load(self):
+        """Load the index from its sidecar file; returns False if unavailable"""
+        try:
+            if not os.path.exists(self.index_file):
+                return False
+            
+            with open(self.index_file, 'r') as f:
+                stored = json.load(f)
+            
+            self._load_documents(stored['documents'].items())
+            self.fingerprint = stored['fingerprint']
+            return True
+            
+        except Exception as e:
+            print(f"Error loading search index: {str(e)}")
+            self.reset()
+            return False
+    
+    def save(self):
+        """Write the sidecar file"""
+        try:
+            # The index can be rebuilt, so skip the fsyncs
+            atomic_write_json(self.index_file, {
+                'fingerprint': self.fingerprint,
+                'documents': self.documents
+            }, fsync=False)
+            self.unsaved_changes = 0
+            return True
+            
+        except Exception as e:
+            print(f"Error saving search index: {str(e)}")
+            return False
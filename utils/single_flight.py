@@ -0,0 +1,90 @@
+"""
+Single-flight request coalescing for Weather Dashboard
+Author: Mindy Stricklin
+"""
+
+import asyncio
+import threading
+
+class _Call:
+    """One in-flight call that other callers can wait on"""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one execution.
+    The first caller runs the function; everyone who arrives while it
+    is still running waits and gets the same result or exception.
+    """
+    
+    def __init__(self):
+        self._calls = {}
+        self._tasks = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.coalesced = 0
+    
+    def do(self, key, fn, *args, **kwargs):
+        """Run fn for key, or wait for the call already in flight"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+                leader = True
+        
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+    
+    async def do_async(self, key, coro_fn, *args, **kwargs):
+        """Asyncio version of do() for coroutine functions"""
+        with self._lock:
+            task = self._tasks.get(key)
+            if task is not None:
+                self.coalesced += 1
+            else:
+                task = asyncio.ensure_future(coro_fn(*args, **kwargs))
+                self._tasks[key] = task
+                self.executed += 1
+                task.add_done_callback(lambda _: self._forget_task(key, task))
+        
+        # Shield so one cancelled waiter does not cancel the shared call
+        return await asyncio.shield(task)
+    
+    def _forget_task(self, key, task):
+        """Drop a finished task from the in-flight table"""
+        with self._lock:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+    
+    def get_stats(self):
+        """Get counters for executed and coalesced calls"""
+        with self._lock:
+            return {
+                'executed': self.executed,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._calls) + len(self._tasks)
+            }
@@ -0,0 +1,174 @@
+"""
+Snapshot + append-only log storage for Weather Dashboard
+Author: Mindy Stricklin
+"""
+
+import os
+import json
+import threading
+
+from utils.atomic_file import write_durable, fsync_folder, file_lock
+
+class SnapshotLog:
+    """
+    Stores data as a JSON snapshot plus an append-only JSON Lines log of
+    changes made since the snapshot. Writes only append one line to the
+    log; compaction folds the log back into a new snapshot.
+    
+    Compaction moves the log aside to a '.compacting' file, writes the
+    new snapshot to '.new', then deletes the '.compacting' file and
+    renames '.new' into place. Deleting '.compacting' is the commit
+    point, so after a crash the files always replay to the same state.
+    
+    With lock_files, every operation also takes an advisory file lock so
+    several processes can share the files; compactions are serialized
+    by a lock of their own so appends can continue while one runs.
+    """
+    
+    def __init__(self, snapshot_file, log_file, lock_files=False):
+        self.snapshot_file = snapshot_file
+        self.log_file = log_file
+        self.compacting_file = f"{log_file}.compacting"
+        self.new_snapshot_file = f"{snapshot_file}.new"
+        self.lock_files = lock_files
+        self.log_records = 0
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self.recover()
+        self.log_records = self._count_log_records()
+    
+    def recover(self):
+        """Finish or roll back a compaction interrupted by a crash"""
+        # Wait out another process's compaction rather than undo it
+        with self._compaction_file_lock(), self._lock, self._file_lock():
+            # End a torn last line so the next append starts cleanly
+            for path in (self.compacting_file, self.log_file):
+                if os.path.exists(path) and os.path.getsize(path) > 0:
+                    with open(path, 'rb+') as f:
+                        f.seek(-1, os.SEEK_END)
+                        if f.read(1) != b'\n':
+                            f.write(b'\n')
+            
+            if not os.path.exists(self.new_snapshot_file):
+                return
+            if os.path.exists(self.compacting_file):
+                # Not committed: the old snapshot and logs are still complete
+                os.remove(self.new_snapshot_file)
+            else:
+                os.replace(self.new_snapshot_file, self.snapshot_file)
+    
+    def _file_lock(self, shared=False):
+        """Lock the files against other processes, if lock_files is set"""
+        return file_lock(self.snapshot_file, shared=shared, enabled=self.lock_files)
+    
+    def _compaction_file_lock(self):
+        """Keep other processes from compacting at the same time, if lock_files is set"""
+        return file_lock(self.compacting_file, enabled=self.lock_files)
+    
+    def _count_log_records(self):
+        """Count the records waiting in the log files"""
+        count = 0
+        for path in (self.compacting_file, self.log_file):
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    count += sum(1 for line in f if line.strip())
+        return count
+    
+    def _read_snapshot(self, default):
+        """Read the snapshot file, or return default if there is none"""
+        if not os.path.exists(self.snapshot_file):
+            return default
+        with open(self.snapshot_file, 'r') as f:
+            return json.load(f)
+    
+    def read(self, default=None):
+        """
+        Read the snapshot and every logged record since it.
+        Returns (snapshot data, list of log records)
+        """
+        with self._lock, self._file_lock(shared=True):
+            snapshot = self._read_snapshot(default)
+            
+            records = []
+            for path in (self.compacting_file, self.log_file):
+                records.extend(self._read_log(path))
+            
+            self.log_records = len(records)
+            return snapshot, records
+    
+    def _read_log(self, path):
+        """Read one log file, skipping a torn last line left by a crash"""
+        records = []
+        if not os.path.exists(path):
+            return records
+        
+        with open(path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    print(f"Skipping unreadable log record in {path}")
+        return records
+    
+    def append(self, record):
+        """Append one record to the log"""
+        line = json.dumps(record) + '\n'
+        with self._lock, self._file_lock():
+            with open(self.log_file, 'a') as f:
+                f.write(line)
+            self.log_records += 1
+    
+    def _write_new_snapshot(self, data):
+        """Write and fsync the '.new' snapshot file"""
+        write_durable(self.new_snapshot_file, json.dumps(data, indent=2))
+    
+    def _move_log_aside(self):
+        """Move the current log into the '.compacting' file (lock must be held)"""
+        if not os.path.exists(self.log_file):
+            return
+        if not os.path.exists(self.compacting_file):
+            os.replace(self.log_file, self.compacting_file)
+            return
+        
+        # An earlier compaction failed; fold the log into its file
+        with open(self.log_file, 'r') as source, open(self.compacting_file, 'a') as target:
+            target.write(source.read())
+        os.remove(self.log_file)
+    
+    def _commit(self):
+        """Drop the folded log and install the new snapshot (lock must be held)"""
+        if os.path.exists(self.compacting_file):
+            os.remove(self.compacting_file)
+        os.replace(self.new_snapshot_file, self.snapshot_file)
+        fsync_folder(os.path.dirname(self.snapshot_file))
+    
+    def compact(self, fold, default=None):
+        """
+        Fold the log into a new snapshot. fold(snapshot, records) must
+        return the new snapshot data. Appends made while the fold runs
+        go to a fresh log and are kept.
+        """
+        with self._compact_lock, self._compaction_file_lock():
+            with self._lock, self._file_lock():
+                self._move_log_aside()
+                snapshot = self._read_snapshot(default)
+                records = self._read_log(self.compacting_file)
+            
+            self._write_new_snapshot(fold(snapshot, records))
+            
+            with self._lock, self._file_lock():
+                self._commit()
+                # Only appends made during the fold are left in the log
+                self.log_records = self._count_log_records()
+                return self.log_records
+    
+    def write_snapshot(self, data):
+        """Replace the snapshot and discard every logged record"""
+        with self._compact_lock, self._compaction_file_lock(), self._lock, self._file_lock():
+            self._move_log_aside()
+            self._write_new_snapshot(data)
+            self._commit()
+            self.log_records = 0
@@ -0,0 +1,234 @@
+"""
+SQLite storage for weather history
+Author: Mindy Stricklin
+"""
+
+import os
+import sqlite3
+import threading
+
+class SQLiteHistoryStore:
+    """
+    Stores weather observations in a SQLite database with an index on
+    (city, date). Range queries and aggregates run inside SQLite, so
+    only the result rows are ever loaded into Python.
+    """
+    
+    SCHEMA = [
+        """
+        CREATE TABLE IF NOT EXISTS observations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            city TEXT NOT NULL,
+            state TEXT NOT NULL,
+            temp REAL,
+            condition TEXT NOT NULL,
+            pressure REAL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_observations_city_date ON observations (city, date)",
+        "CREATE INDEX IF NOT EXISTS idx_observations_date ON observations (date)"
+    ]
+    
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        
+        folder = os.path.dirname(db_path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        with self.connection:
+            for statement in self.SCHEMA:
+                self.connection.execute(statement)
+    
+    def close(self):
+        """Close the database connection"""
+        self.connection.close()
+    
+    @staticmethod
+    def _to_float(value):
+        """Convert a temperature or pressure to float, None if missing"""
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+    
+    @staticmethod
+    def _format_number(value):
+        """
+        Format a stored number the way the text history writes it, with
+        every digit needed to read back the same float
+        """
+        if value is None:
+            return 'N/A'
+        text = repr(float(value))
+        return text[:-2] if text.endswith('.0') else text
+    
+    def _to_record(self, row):
+        """Convert a (date, city, state, temp, condition, pressure) row to a record dict"""
+        return {
+            'date': row[0],
+            'city': row[1],
+            'state': row[2],
+            'temp': self._format_number(row[3]),
+            'condition': row[4],
+            'pressure': self._format_number(row[5])
+        }
+    
+    def _query(self, sql, params=()):
+        """Run a read query and return every row"""
+        with self._lock:
+            return self.connection.execute(sql, params).fetchall()
+    
+    def append(self, date_str, city, state, temp, condition, pressure=None):
+        """Append a single observation"""
+        return self.append_many([(date_str, city, state, temp, condition, pressure)])
+    
+    def append_many(self, records):
+        """
+        Append observations given as (date, city, state, temp, condition,
+        pressure) tuples in one transaction
+        """
+        rows = [
+            (date_str, city, state, self._to_float(temp), condition, self._to_float(pressure))
+            for date_str, city, state, temp, condition, pressure in records
+        ]
+        
+        with self._lock, self.connection:
+            self.connection.executemany(
+                "INSERT INTO observations (date, city, state, temp, condition, pressure) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+        return len(rows)
+    
+    def __len__(self):
+        return self._query("SELECT COUNT(*) FROM observations")[0][0]
+    
+    def tail(self, count):
+        """Get the last N records in insertion order"""
+        rows = self._query(
+            "SELECT date, city, state, temp, condition, pressure FROM observations "
+            "ORDER BY id DESC LIMIT ?",
+            (count,)
+        )
+        return [self._to_record(row) for row in reversed(rows)]
+    
+    def iter_records(self, batch_size=10000):
+        """Yield every record in insertion order, one batch of rows at a time"""
+        last_id = 0
+        while True:
+            rows = self._query(
+                "SELECT id, date, city, state, temp, condition, pressure FROM observations "
+                "WHERE id > ? ORDER BY id LIMIT ?",
+                (last_id, batch_size)
+            )
+            if not rows:
+                return
+            
+            for row in rows:
+                yield self._to_record(row[1:])
+            last_id = rows[-1][0]
+    
+    def get_range(self, city, start_date, end_date):
+        """Get one city's records within an inclusive date range"""
+        rows = self._query(
+            "SELECT date, city, state, temp, condition, pressure FROM observations "
+            "WHERE city = ? AND date BETWEEN ? AND ? ORDER BY date, id",
+            (city, start_date, end_date)
+        )
+        return [self._to_record(row) for row in rows]
+    
+    def _where(self, start_date=None, end_date=None, city=None):
+        """Build a WHERE clause and its params for the optional filters"""
+        clauses = []
+        params = []
+        if city is not None:
+            clauses.append("city = ?")
+            params.append(city)
+        if start_date is not None:
+            clauses.append("date >= ?")
+            params.append(start_date)
+        if end_date is not None:
+            clauses.append("date <= ?")
+            params.append(end_date)
+        
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, params
+    
+    def summarize(self, start_date=None, end_date=None, city=None):
+        """Get temperature, pressure and condition aggregates for a range"""
+        where, params = self._where(start_date, end_date, city)
+        return self._summarize_source(f"(SELECT * FROM observations {where})", params)
+    
+    def summarize_recent(self, count):
+        """Get aggregates over the last N records"""
+        return self._summarize_source(
+            "(SELECT * FROM observations ORDER BY id DESC LIMIT ?)", [count]
+        )
+    
+    def _summarize_source(self, source, params):
+        """Compute aggregates over a subquery entirely in SQL"""
+        totals = self._query(
+            f"SELECT COUNT(*), AVG(temp), MIN(temp), MAX(temp), AVG(pressure) FROM {source}",
+            params
+        )[0]
+        # Ties go to the condition seen first, like the text backend
+        conditions = self._query(
+            f"SELECT condition, COUNT(*) FROM {source} "
+            f"GROUP BY condition ORDER BY COUNT(*) DESC, MIN(id)",
+            params
+        )
+        
+        return {
+            'count': totals[0],
+            'avg_temp': totals[1],
+            'min_temp': totals[2],
+            'max_temp': totals[3],
+            'avg_pressure': totals[4],
+            'conditions': dict(conditions)
+        }
+    
+    def city_stats(self):
+        """Get per-city counts, temperature stats and date span"""
+        rows = self._query(
+            "SELECT city, state, COUNT(*), AVG(temp), MIN(temp), MAX(temp), "
+            "AVG(pressure), MIN(date), MAX(date) FROM observations "
+            "GROUP BY city, state ORDER BY city, state"
+        )
+        return [
+            {
+                'city': row[0],
+                'state': row[1],
+                'count': row[2],
+                'avg_temp': row[3],
+                'min_temp': row[4],
+                'max_temp': row[5],
+                'avg_pressure': row[6],
+                'first_date': row[7],
+                'last_date': row[8]
+            }
+            for row in rows
+        ]
+    
+    def city_conditions(self):
+        """
+        Get each city's condition counts in one grouped query.
+        Returns {(city, state): {condition: count}}, most frequent first
+        """
+        rows = self._query(
+            "SELECT city, state, condition, COUNT(*) FROM observations "
+            "GROUP BY city, state, condition ORDER BY city, state, COUNT(*) DESC, MIN(id)"
+        )
+        conditions = {}
+        for city, state, condition, count in rows:
+            conditions.setdefault((city, state), {})[condition] = count
+        return conditions
+    
+    def clear(self):
+        """Delete every observation"""
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM observations")